@@ -27,4 +27,147 @@ DEFAULT_PERIOD = "1y"
 
 # Technical Analysis Parameters
 RSI_OVERBOUGHT = 70
-RSI_OVERSOLD = 30 
\ No newline at end of file
+RSI_OVERSOLD = 30 
+
+# Portfolio Analytics
+VOLATILITY_WINDOW = 20  # Trading days used for rolling volatility
+VAR_CONFIDENCE = 0.95  # Confidence level for historical Value at Risk
+VAR_WINDOW = 60  # Trading days of P/L used for historical Value at Risk
+BAR_CACHE_TTL = 15 * 60  # Seconds before cached daily bars are refreshed
+
+# Fundamentals Cache
+FUNDAMENTALS_TTL = 24 * 60 * 60  # Seconds before cached fundamentals are refetched
+FUNDAMENTALS_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fundamentals.json"
+)
+FUNDAMENTALS_PREFETCH_WORKERS = 8  # Concurrent fetches during universe prefetch
+
+# Alerts
+ALERT_CHECK_INTERVAL = 60  # Seconds between alert evaluations
+MAX_ALERTS_PER_USER = 50
+
+# Broker and Recorded Data
+BROKER = os.getenv("BROKER", "alpaca")  # "alpaca" or "sim" for the local simulated broker
+REPLAY_DATA_DIR = os.getenv("REPLAY_DATA_DIR")  # Directory of recorded <TICKER>.csv bars
+SIM_STARTING_CASH = 100000.0
+SIM_BROKER_PATH = os.getenv("SIM_BROKER_PATH", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "sim_broker.db"
+))  # Simulated account shared by the gateway and workers; delete it to reset
+
+# Strategy Runner
+STRATEGY_INTERVAL_MINUTES = 15
+STRATEGY_DRY_RUN = os.getenv("STRATEGY_DRY_RUN", "true").lower() != "false"
+STRATEGY_MAX_WORKERS = 4  # Concurrent indicator/LLM requests per cycle
+STRATEGY_CYCLE_BUDGET = 300  # Seconds a cycle may spend before it stops
+STRATEGY_SCAN_SIZE = 20  # Names taken from each watchlist scan
+STRATEGY_SHORTLIST_SIZE = 5  # Names sent to the AI per cycle
+STRATEGY_MAX_ORDERS_PER_CYCLE = 3
+
+# Job Queue and Workers
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqlite")  # "sqlite" or "memory"
+JOB_QUEUE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "jobs.db"
+)
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", os.cpu_count() or 2))  # Shards / worker processes
+START_WORKERS = os.getenv("START_WORKERS", "true").lower() != "false"  # Spawn workers with the bot
+WORKER_THREADS = 4  # Jobs processed concurrently inside each worker
+WORKER_POLL_INTERVAL = 0.2  # Seconds an idle worker waits before polling again
+RESULT_POLL_INTERVAL = 0.5  # Seconds between result deliveries in the gateway
+
+# Discord Output
+DISCORD_MESSAGE_LIMIT = 2000  # Maximum characters per Discord message
+
+# Scheduler and Quotas
+# Job kinds map to priority classes; lower numbers are claimed first
+# Stats jobs are instant, so they go first, in a class of their own that never counts against orders
+JOB_PRIORITIES = {"stats": -1, "order": 0, "trade": 1, "strategy": 1, "scan": 2, "correlation": 2}
+PRIORITY_CLASSES = {-1: "stats", 0: "order", 1: "analysis", 2: "scan"}
+USER_QUOTAS = {"stats": (2, 60), "order": (5, 60), "analysis": (1, 30), "scan": (2, 60)}  # (requests, per seconds)
+GUILD_QUOTAS = {"stats": (10, 60), "order": (60, 60), "analysis": (10, 60), "scan": (6, 60)}
+MAX_QUEUE_DEPTH = {"stats": 50, "order": 200, "analysis": 50, "scan": 10}  # Queued jobs before shedding
+SCHEDULER_MAX_TRACKED_KEYS = 10000  # Users/guilds whose buckets are kept in memory
+
+# Market Data Providers
+# Tried in latency order; replay data replaces them all when REPLAY_DATA_DIR is set
+MARKET_DATA_PROVIDERS = os.getenv("MARKET_DATA_PROVIDERS", "yfinance,alpaca").split(",")
+HEDGE_DELAYS = {"bars": 2.0, "quote": 0.5, "fundamentals": 5.0}  # Seconds before asking the next provider
+PROVIDER_FAILURE_COOLDOWN = 60  # Seconds a failed provider is tried last
+LATENCY_EWMA_ALPHA = 0.2  # Weight of the newest sample in provider latency averages
+
+# AI Decisions
+DECISION_CONFIDENCE_THRESHOLD = 60  # Minimum confidence (%) before a Buy/Sell is acted on
+PREFILTER_RSI_BUY = 25  # RSI at or below this with a rising MACD is an obvious Buy
+PREFILTER_RSI_SELL = 75  # RSI at or above this with a falling MACD is an obvious Sell
+PREFILTER_NEUTRAL_RSI = (45, 55)  # RSI band that is an obvious Hold when MACD is flat
+PREFILTER_FLAT_MACD = 0.001  # MACD histogram below this fraction of price counts as flat
+PREFILTER_CONFIDENCE = 80  # Confidence given to rule-based decisions
+
+# AI Model Routing
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "gemini", or "stub" for offline runs
+# Models per tier in preference order; rate-limited models fall back to the next
+MODEL_TIERS = {
+    "fast": ["gemini-1.5-flash", "gemini-1.5-flash-8b", "gemini-1.5-pro"],  # Short prompts (sentiment)
+    "pro": ["gemini-1.5-pro", "gemini-1.5-flash"],  # Trading decisions
+}
+MODEL_COSTS = {  # USD per million (input, output) tokens
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+}
+MODEL_MIN_INTERVALS = {"gemini-1.5-pro": 2.0}  # Seconds between calls to a model (default 0.5)
+MODEL_REQUEST_TIMEOUT = 30  # Seconds per model request
+MODEL_COOLDOWN = (1.0, 60.0)  # Seconds a rate-limited model is skipped (doubles per 429, capped)
+
+# Shared Market Snapshot
+SNAPSHOT_NAME = os.getenv("SNAPSHOT_NAME", "ai_trading_bot_snapshot")  # Shared memory block
+START_SNAPSHOT_WRITER = os.getenv("START_SNAPSHOT_WRITER", "true").lower() != "false"
+SNAPSHOT_CAPACITY = 1024  # Maximum symbols in the snapshot
+SNAPSHOT_DAYS = 5  # Daily bars kept per symbol
+SNAPSHOT_UNIVERSE_SIZE = 100  # S&P 500 names the writer keeps fresh
+SNAPSHOT_REFRESH_INTERVAL = 60  # Seconds between writer refreshes
+SNAPSHOT_WORKERS = 8  # Concurrent fetches in the writer
+SNAPSHOT_MAX_AGE = 180  # Seconds before a snapshot row is too stale to use
+SNAPSHOT_ATTACH_RETRY = 30  # Seconds between reader attempts to find the snapshot
+
+# Historical Data Warehouse
+WAREHOUSE_DIR = os.getenv("WAREHOUSE_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "warehouse"
+))
+WAREHOUSE_BACKFILL = {"1d": "5y", "1h": "1y", "1m": "7d"}  # History fetched for a new symbol, per interval
+START_WAREHOUSE_UPDATER = os.getenv("START_WAREHOUSE_UPDATER", "true").lower() != "false"
+WAREHOUSE_UPDATE_MINUTES = 360  # Minutes between daily-bar updates by the bot's updater process
+WAREHOUSE_WORKERS = 8  # Concurrent fetches during an update
+WAREHOUSE_MAX_STALENESS = 4  # Days without new bars before queries fall back to providers
+
+# Correlation and Pairs Scanner
+CORRELATION_HISTORY = "1y"  # Daily closes loaded when the universe is (re)built
+CORRELATION_WINDOW = 60  # Trading days in the rolling return correlation
+COINTEGRATION_WINDOW = 252  # Trading days of log prices tested for cointegration
+CORRELATION_MAX_MISSING = 0.1  # Symbols missing more of their history are left out
+CORRELATION_BLOCK = 128  # Symbols per block in the correlation matrix product
+PAIRS_MIN_CORRELATION = 0.8  # Pairs below this correlation are not tested
+PAIRS_CANDIDATES = 500  # Most correlated pairs tested for cointegration
+COINTEGRATION_CRITICAL = -3.34  # Engle-Granger 5% critical value (two series, with constant)
+CORRELATION_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "correlations.npz"
+)
+
+# Retries and Circuit Breakers
+# Per external dependency: attempts per call, backoff (base, cap) seconds with full
+# jitter, consecutive failures that open the breaker, seconds before a probe call,
+# and the retry budget (retries earned per call, most banked)
+RESILIENCE_POLICIES = {
+    "gemini": {"attempts": 2, "backoff": (0.5, 4.0), "failure_threshold": 5, "reset_timeout": 30,
+               "retry_ratio": 0.2, "retry_burst": 10, "retry_rate_limits": False},  # The router falls back instead
+    "yahoo": {"attempts": 3, "backoff": (0.25, 2.0), "failure_threshold": 5, "reset_timeout": 30,
+              "retry_ratio": 0.2, "retry_burst": 20, "retry_rate_limits": True},
+    "alpaca_data": {"attempts": 3, "backoff": (0.25, 2.0), "failure_threshold": 5, "reset_timeout": 30,
+                    "retry_ratio": 0.2, "retry_burst": 20, "retry_rate_limits": True},
+    "alpaca": {"attempts": 3, "backoff": (0.5, 4.0), "failure_threshold": 5, "reset_timeout": 30,
+               "retry_ratio": 0.2, "retry_burst": 10, "retry_rate_limits": True},
+    "wikipedia": {"attempts": 3, "backoff": (1.0, 8.0), "failure_threshold": 3, "reset_timeout": 300,
+                  "retry_ratio": 0.5, "retry_burst": 3, "retry_rate_limits": True},
+}
+# Seconds a worker may spend on a job before its dependency calls fail fast (None: no limit).
+# Orders have none: an order in flight must be able to finish or cancel.
+JOB_DEADLINES = {"order": None, "stats": 10, "trade": 90, "strategy": None, "scan": 120, "correlation": 600}
@@ -1,174 +1,55 @@
-import time
-import random
-from functools import wraps
-from typing import Any, Callable
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from config.config import GOOGLE_API_KEY
-
-# Configure Gemini
-genai.configure(api_key=GOOGLE_API_KEY)
-
-# Initialize the model with a lower temperature for more focused responses
-model = ChatGoogleGenerativeAI(
-    model="gemini-1.5-pro",
-    temperature=0.7,
-    convert_system_message_to_human=True,
-    max_retries=3,  # Limit retries
-    request_timeout=30,  # Set timeout
+import json
+import re
+from dataclasses import dataclass
+from config.config import (
+    DECISION_CONFIDENCE_THRESHOLD,
+    PREFILTER_RSI_BUY,
+    PREFILTER_RSI_SELL,
+    PREFILTER_NEUTRAL_RSI,
+    PREFILTER_FLAT_MACD,
+    PREFILTER_CONFIDENCE,
 )
-
-# Rate limiting settings
-MIN_DELAY_BETWEEN_CALLS = 2.0  # Minimum seconds between API calls
-last_api_call_time = 0
-
-
-def wait_for_rate_limit():
-    """Ensure minimum delay between API calls."""
-    global last_api_call_time
-    current_time = time.time()
-    time_since_last_call = current_time - last_api_call_time
-
-    if time_since_last_call < MIN_DELAY_BETWEEN_CALLS:
-        sleep_time = MIN_DELAY_BETWEEN_CALLS - time_since_last_call
-        time.sleep(sleep_time)
-
-    last_api_call_time = time.time()
-
-
-class RateLimitError(Exception):
-    """Custom exception for rate limiting"""
-
-    pass
-
-
-def exponential_backoff(
-    max_retries: int = 5,
-    base_delay: float = 1.0,
-    max_delay: float = 32.0,
-    jitter: bool = True,
-) -> Callable:
+from singleflight import single_flight
+from model_router import router as model_router, RateLimitError
+
+ACTIONS = ("buy", "sell", "hold")
+
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "enum": list(ACTIONS)},
+        "confidence": {"type": "integer", "minimum": 0, "maximum": 100},
+        "reason": {"type": "string"},
+    },
+    "required": ["action", "confidence", "reason"],
+}
+
+JSON_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+ACTION_PATTERN = re.compile(r"\b(buy|sell|hold)\b", re.IGNORECASE)
+PERCENT_PATTERN = re.compile(r"(\d{1,3}(?:\.\d+)?)\s*%")
+TEN_SCALE_PATTERN = re.compile(r"(\d{1,2}(?:\.\d+)?)\s*/\s*10\b")
+
+
+@dataclass
+class TradeDecision:
+    """A Buy/Sell/Hold call with a 0-100 confidence.
+
+    `source` records where it came from: "rules" (indicator pre-filter, no
+    LLM call), "llm" (parsed JSON), "llm_text" (regex fallback over free
+    text) or "error".
     """
-    Decorator for exponential backoff with jitter.
 
-    Args:
-        max_retries: Maximum number of retry attempts
-        base_delay: Initial delay between retries in seconds
-        max_delay: Maximum delay between retries in seconds
-        jitter: Whether to add random jitter to delay
-    """
+    action: str
+    confidence: int
+    reason: str
+    source: str = "llm"
 
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    if "429" in str(e) or "Resource has been exhausted" in str(e):
-                        retries += 1
-                        if retries == max_retries:
-                            raise RateLimitError(
-                                f"Maximum retries ({max_retries}) exceeded. Last error: {str(e)}"
-                            )
-
-                        # Calculate delay with exponential backoff
-                        delay = min(base_delay * (2 ** (retries - 1)), max_delay)
-
-                        # Add jitter if enabled
-                        if jitter:
-                            delay = delay * (0.5 + random.random())
-
-                        print(f"Rate limit hit. Retrying in {delay:.2f} seconds...")
-                        time.sleep(delay)
-                    else:
-                        raise
-            return None
-
-        return wrapper
-
-    return decorator
-
-
-@exponential_backoff()
-def analyze_sentiment(query: str) -> str:
-    """Analyze market sentiment with rate limiting and retries."""
-    try:
-        wait_for_rate_limit()  # Add rate limiting
+    def is_actionable(self, threshold=DECISION_CONFIDENCE_THRESHOLD):
+        """True for a Buy or Sell with at least `threshold` confidence."""
+        return self.action != "hold" and self.confidence >= threshold
 
-        prompt = f"""
-        Analyze the market sentiment for: {query}
-        
-        Please provide a structured analysis covering:
-        1. Overall market sentiment (bullish/bearish/neutral)
-        2. Key factors influencing the sentiment
-        3. Potential market impact
-        
-        Keep the response concise and focused on actionable insights.
-        """
-
-        response = model.invoke(prompt)
-        return response.content
-    except Exception as e:
-        if "429" in str(e):
-            raise  # Let the decorator handle rate limiting
-        return f"Error analyzing sentiment: {str(e)}"
-
-
-@exponential_backoff()
-def ai_trading_decision(ticker: str, technical_data: dict, sentiment: str) -> str:
-    """Generate trading decision with rate limiting and retries."""
-    try:
-        wait_for_rate_limit()  # Add rate limiting
-
-        prompt = f"""
-        Analyze {ticker} for trading decision based on:
-        
-        Technical Indicators:
-        {technical_data}
-        
-        Market Sentiment:
-        {sentiment}
-        
-        Provide:
-        1. Trading recommendation (Buy/Sell/Hold)
-        2. Confidence level (1-10)
-        3. Key reasons for decision
-        4. Risk factors to consider
-        5. Suggested entry/exit points
-        
-        Keep the analysis focused and actionable.
-        """
-
-        response = model.invoke(prompt)
-        return response.content
-    except Exception as e:
-        if "429" in str(e):
-            raise  # Let the decorator handle rate limiting
-        return f"Error generating trading decision: {str(e)}"
-
-
-def generate_trade_summary(ticker: str, decision: str, technical_data: dict) -> str:
-    """Format the trading decision into a Discord message."""
-    try:
-        summary = f"""
-🎯 **Trading Analysis for ${ticker}**
-
-{decision}
-
-📊 **Technical Indicators**
-"""
-        # Add key technical indicators
-        for indicator, value in technical_data.items():
-            if isinstance(value, (int, float)):
-                summary += f"• {indicator}: {value:.2f}\n"
-            else:
-                summary += f"• {indicator}: {value}\n"
-
-        return summary
-    except Exception as e:
-        return f"Error generating summary: {str(e)}"
+    def __str__(self):
+        return f"{self.action.title()} - {self.confidence}% - {self.reason}"
 
 
 def truncate_message(message, max_length=1500):
@@ -178,8 +59,85 @@ def truncate_message(message, max_length=1500):
     return message[: max_length - 3] + "..."
 
 
-def analyze_sentiment(news_headline):
-    """Uses LLM to analyze stock news sentiment."""
+def clamp_confidence(value):
+    return max(0, min(100, int(round(float(value)))))
+
+
+def parse_decision(text):
+    """Parse a model reply into a TradeDecision.
+
+    The reply should be JSON matching DECISION_SCHEMA. Replies wrapped in
+    prose or code fences have the JSON object extracted first; anything else
+    falls back to regexes over the free text. A reply without a readable
+    confidence gets 0, so it is never acted on.
+    """
+    text = (text or "").strip()
+    match = JSON_PATTERN.search(text)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            action = str(data["action"]).lower()
+            if action in ACTIONS:
+                return TradeDecision(
+                    action,
+                    clamp_confidence(data.get("confidence", 0)),
+                    truncate_message(str(data.get("reason", "")).strip(), 300),
+                    "llm",
+                )
+        except (ValueError, KeyError, TypeError, AttributeError):
+            pass
+
+    # Free text such as "Buy - 75% - Strong momentum" or "Confidence: 7/10"
+    action_match = ACTION_PATTERN.search(text)
+    percent_match = PERCENT_PATTERN.search(text)
+    scale_match = TEN_SCALE_PATTERN.search(text)
+    if percent_match:
+        confidence = clamp_confidence(percent_match.group(1))
+    elif scale_match:
+        confidence = clamp_confidence(float(scale_match.group(1)) * 10)
+    else:
+        confidence = 0
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    reason = lines[0].split(" - ")[-1] if lines else ""
+    return TradeDecision(
+        action_match.group(1).lower() if action_match else "hold",
+        confidence,
+        truncate_message(reason, 300),
+        "llm_text",
+    )
+
+
+def prefilter_decision(technical_data):
+    """Decide from indicators alone when the answer is obvious, else None.
+
+    Deeply oversold with a rising MACD is a Buy, deeply overbought with a
+    falling MACD is a Sell, and a mid-range RSI with a flat MACD is a Hold.
+    Everything in between goes to the LLM.
+    """
+    rsi, macd_hist, price = (
+        technical_data["rsi"],
+        technical_data["macd_hist"],
+        technical_data["price"],
+    )
+    if rsi <= PREFILTER_RSI_BUY and macd_hist > 0:
+        return TradeDecision(
+            "buy", PREFILTER_CONFIDENCE, f"Oversold (RSI {rsi:.1f}) with MACD turning up", "rules"
+        )
+    if rsi >= PREFILTER_RSI_SELL and macd_hist < 0:
+        return TradeDecision(
+            "sell", PREFILTER_CONFIDENCE, f"Overbought (RSI {rsi:.1f}) with MACD turning down", "rules"
+        )
+    low, high = PREFILTER_NEUTRAL_RSI
+    if low <= rsi <= high and abs(macd_hist) < PREFILTER_FLAT_MACD * price:
+        return TradeDecision(
+            "hold", PREFILTER_CONFIDENCE, f"Neutral RSI ({rsi:.1f}) and flat MACD", "rules"
+        )
+    return None
+
+
+@single_flight
+def analyze_sentiment(news_headline: str) -> str:
+    """Uses the fast model tier to analyze stock news sentiment."""
     try:
         prompt = f"""
         Quick sentiment analysis:
@@ -187,14 +145,14 @@ def analyze_sentiment(news_headline):
         
         Format: Sentiment (pos/neg/neu) - Key impact
         """
-        response = model.invoke(prompt)
-        return truncate_message(response.content)
+        return truncate_message(model_router.invoke("fast", prompt))
     except Exception as e:
         return f"Error analyzing sentiment: {str(e)}"
 
 
-def ai_trading_decision(ticker, technical_data, news_sentiment):
-    """Uses an AI model to decide whether to buy/sell."""
+@single_flight
+def ai_trading_decision(ticker: str, technical_data: dict, news_sentiment: str) -> TradeDecision:
+    """Ask the pro model tier for a structured Buy/Sell/Hold decision."""
     try:
         prompt = f"""
         Quick trading analysis for {ticker}:
@@ -203,20 +161,38 @@ def ai_trading_decision(ticker, technical_data, news_sentiment):
         MACD: {technical_data['macd']:.2f}
         News: {news_sentiment}
 
-        Format: Action (Buy/Sell/Hold) - Confidence% - Key reason
+        Reply with a single JSON object matching this schema:
+        {json.dumps(DECISION_SCHEMA)}
+        Confidence is a percentage; keep the reason to one sentence.
         """
 
-        response = model.invoke(prompt)
-        return truncate_message(response.content)
+        return parse_decision(
+            model_router.invoke("pro", prompt, json_mode=True, temperature=0.2)
+        )
+    except RateLimitError as e:
+        return TradeDecision("hold", 0, str(e), "error")
     except Exception as e:
-        return f"Error generating trading decision: {str(e)}"
+        return TradeDecision("hold", 0, f"Error generating trading decision: {str(e)}", "error")
+
+
+def get_trade_decision(ticker: str, technical_data: dict) -> TradeDecision:
+    """Decide on a ticker, calling the LLM only when the indicators are not conclusive."""
+    decision = prefilter_decision(technical_data)
+    if decision is not None:
+        return decision
+    news_sentiment = analyze_sentiment(f"Recent news about {ticker}")
+    return ai_trading_decision(ticker, technical_data, news_sentiment)
 
 
-def generate_trade_summary(ticker, decision, technical_data):
+def generate_trade_summary(ticker: str, decision: TradeDecision, technical_data: dict) -> str:
     """Generate a formatted summary of the trading decision."""
     summary = f"""
 📊 {ticker} Analysis
 💰 ${technical_data['price']:.2f} | RSI: {technical_data['rsi']:.2f}
 🤖 {decision}
 """
-    return truncate_message(summary)
+    if decision.source == "rules":
+        summary += "   (decided by indicator rules)\n"
+    if decision.action != "hold" and not decision.is_actionable():
+        summary += f"⚠️ Below the {DECISION_CONFIDENCE_THRESHOLD}% confidence threshold; treat as Hold\n"
+    return summary
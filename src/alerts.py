@@ -0,0 +1,202 @@
+import threading
+import time
+import numpy as np
+from config.config import MAX_ALERTS_PER_USER
+
+# Fields an alert can watch, as returned by get_technical_indicators
+ALERT_FIELDS = ("price", "rsi", "macd", "macd_signal", "macd_hist", "volume")
+
+OPERATORS = {
+    "above": "above",
+    ">": "above",
+    ">=": "above",
+    "below": "below",
+    "<": "below",
+    "<=": "below",
+}
+
+# Index groups, numbered for the vectorized index build
+GROUPS = [(field, op) for field in ALERT_FIELDS for op in ("above", "below")]
+GROUP_CODES = {group: code for code, group in enumerate(GROUPS)}
+
+
+def _expand_ranges(starts, ends):
+    """Concatenate [start, end) index ranges without a Python loop."""
+    lengths = np.maximum(ends - starts, 0)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+class AlertEngine:
+    """Price/indicator alerts checked in bulk against market snapshots.
+
+    Alerts are grouped by (field, operator). Each group keeps a sorted index of
+    composite keys ``ticker_index * K + threshold_rank``, so the alerts triggered
+    by one ticker's value form a contiguous slice found with ``searchsorted``.
+    Evaluating a snapshot is a handful of vectorized searches per group,
+    independent of the number of alerts. Adding or removing alerts marks the
+    index stale and it is rebuilt, at most once, by the next evaluation;
+    triggered alerts are dropped from it in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._alerts = {}
+        self._next_id = 1
+        self._tickers = {}
+        self._rows = {}  # Alert id -> (id, ticker index, group code, threshold)
+        self._index = None
+
+    def add_alert(self, user_id, ticker, field, operator, threshold):
+        """Register an alert and return it."""
+        field = field.lower()
+        if field not in ALERT_FIELDS:
+            raise ValueError(f"Unknown field '{field}'. Use one of: {', '.join(ALERT_FIELDS)}")
+        op = OPERATORS.get(operator.lower())
+        if op is None:
+            raise ValueError("Condition must be 'above' or 'below'")
+
+        with self._lock:
+            if sum(1 for a in self._alerts.values() if a["user_id"] == user_id) >= MAX_ALERTS_PER_USER:
+                raise ValueError(f"Alert limit reached ({MAX_ALERTS_PER_USER} per user)")
+
+            ticker = ticker.upper()
+            alert = {
+                "id": self._next_id,
+                "user_id": user_id,
+                "ticker": ticker,
+                "field": field,
+                "operator": op,
+                "threshold": float(threshold),
+                "created_at": time.time(),
+            }
+            self._alerts[alert["id"]] = alert
+            self._next_id += 1
+            self._tickers.setdefault(ticker, len(self._tickers))
+            self._rows[alert["id"]] = (
+                alert["id"], self._tickers[ticker], GROUP_CODES[(field, op)], alert["threshold"]
+            )
+            self._index = None
+            return alert
+
+    def remove_alert(self, alert_id, user_id=None):
+        """Remove an alert; returns False if it doesn't exist or belongs to someone else."""
+        with self._lock:
+            alert = self._alerts.get(alert_id)
+            if alert is None or (user_id is not None and alert["user_id"] != user_id):
+                return False
+            del self._alerts[alert_id]
+            del self._rows[alert_id]
+            self._index = None
+            return True
+
+    def get_user_alerts(self, user_id):
+        """List a user's active alerts."""
+        with self._lock:
+            return [a for a in self._alerts.values() if a["user_id"] == user_id]
+
+    def get_tickers(self):
+        """Tickers with at least one active alert."""
+        with self._lock:
+            return sorted({a["ticker"] for a in self._alerts.values()})
+
+    def _build_index(self):
+        """Rebuild the per-(field, operator) sorted indexes."""
+        index = {}
+        if not self._rows:
+            return index
+        rows = np.array(list(self._rows.values()), dtype=float)
+        ids, ticker_idx, codes = rows[:, 0].astype(np.int64), rows[:, 1].astype(np.int64), rows[:, 2]
+        thresholds = rows[:, 3]
+        for code in np.unique(codes).astype(int):
+            in_group = codes == code
+            levels = np.unique(thresholds[in_group])
+            width = len(levels) + 1
+            keys = ticker_idx[in_group] * width + np.searchsorted(levels, thresholds[in_group])
+            order = np.argsort(keys, kind="stable")
+            index[GROUPS[code]] = {
+                "ids": ids[in_group][order],
+                "keys": keys[order],
+                "levels": levels,
+                "width": width,
+            }
+        return index
+
+    def _drop_from_index(self, alert_ids):
+        """Remove triggered alerts from the index; the remaining keys stay sorted and valid."""
+        for key, group in list(self._index.items()):
+            keep = ~np.isin(group["ids"], alert_ids)
+            if not keep.any():
+                del self._index[key]
+            elif not keep.all():
+                group["ids"], group["keys"] = group["ids"][keep], group["keys"][keep]
+
+    def evaluate(self, snapshot):
+        """Check all alerts against a snapshot of {ticker: {field: value}}.
+
+        Triggered alerts are removed and returned as (alert, value) pairs.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            index = self._index
+
+            # One value column per field, aligned with ticker indexes
+            present = [(self._tickers[t], values) for t, values in snapshot.items() if t in self._tickers]
+            if not present:
+                return []
+            ticker_idx = np.array([p[0] for p in present], dtype=np.int64)
+            columns = {
+                field: np.array([p[1].get(field, np.nan) for p in present], dtype=float)
+                for field in {key[0] for key in index}
+            }
+
+            triggered_ids = []
+            triggered_values = []
+            for (field, op), group in index.items():
+                values = columns[field]
+                valid = ~np.isnan(values)
+                tickers, values = ticker_idx[valid], values[valid]
+                base = tickers * group["width"]
+
+                if op == "above":
+                    # value >= threshold  <=>  threshold rank < count of levels <= value
+                    starts = np.searchsorted(group["keys"], base)
+                    ends = np.searchsorted(group["keys"], base + np.searchsorted(group["levels"], values, side="right"))
+                else:
+                    # value <= threshold  <=>  threshold rank >= count of levels < value
+                    starts = np.searchsorted(group["keys"], base + np.searchsorted(group["levels"], values, side="left"))
+                    ends = np.searchsorted(group["keys"], base + group["width"])
+
+                hits = _expand_ranges(starts, ends)
+                if len(hits):
+                    triggered_ids.append(group["ids"][hits])
+                    triggered_values.append(np.repeat(values, np.maximum(ends - starts, 0)))
+
+            if not triggered_ids:
+                return []
+
+            triggered_ids = np.concatenate(triggered_ids)
+            matches = []
+            for alert_id, value in zip(triggered_ids, np.concatenate(triggered_values)):
+                alert = self._alerts.pop(int(alert_id))
+                del self._rows[alert["id"]]
+                matches.append((alert, float(value)))
+            self._drop_from_index(triggered_ids)
+            return matches
+
+
+def format_alert(alert):
+    """Describe an alert condition."""
+    return f"#{alert['id']} ${alert['ticker']} {alert['field']} {alert['operator']} {alert['threshold']:,.2f}"
+
+
+def format_triggered_alerts(matches):
+    """Format triggered alerts for a DM."""
+    message = "🔔 **Alerts Triggered**\n"
+    for alert, value in matches:
+        message += f"   • {format_alert(alert)} (now {value:,.2f})\n"
+    return message
@@ -1,32 +1,157 @@
 import discord
-from discord.ext import commands
-from market_data import get_technical_indicators, get_stock_info
-from ai_trader import analyze_sentiment, ai_trading_decision, generate_trade_summary
-from trade_executor import execute_trade, get_account_info, get_position
-from watchlist import (
-    get_top_gainers,
-    get_momentum_stocks,
-    get_buyer_activity,
-    format_watchlist_message,
+from discord.ext import commands, tasks
+from market_data import get_technical_indicators
+from trade_executor import get_account_info, get_position
+from portfolio import get_portfolio_analytics, format_portfolio_analytics
+from singleflight import get_metrics
+from alerts import AlertEngine, format_alert, format_triggered_alerts
+from job_queue import get_job_queue, shard_for, MemoryJobQueue
+from scheduler import Scheduler
+from data_providers import router as data_router
+from worker import start_workers, format_dependency_stats
+from resilience import get_stats as get_dependency_stats
+from snapshot_writer import start_snapshot_writer
+from warehouse import start_warehouse_updater
+from message_stream import split_message
+from config.config import (
+    DISCORD_TOKEN,
+    ALERT_CHECK_INTERVAL,
+    STRATEGY_INTERVAL_MINUTES,
+    STRATEGY_DRY_RUN,
+    START_WORKERS,
+    START_SNAPSHOT_WRITER,
+    START_WAREHOUSE_UPDATER,
+    RESULT_POLL_INTERVAL,
+    JOB_PRIORITIES,
+    NUM_WORKERS,
 )
-from config.config import DISCORD_TOKEN
 import asyncio
-from datetime import datetime, timedelta
 
 # Bot setup
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix="!", intents=intents)
 
-# Command cooldown tracking
-last_trade_time = {}
-TRADE_COOLDOWN = 30  # seconds between trades per user
+# Server-side price/indicator alerts
+alert_engine = AlertEngine()
+
+# Jobs are processed by sharded workers; results come back through the queue
+job_queue = get_job_queue()
+
+# Priority classes, per-user/per-guild quotas and load shedding
+scheduler = Scheduler(job_queue)
+
+# Channel that receives scheduled strategy reports
+strategy_channel = None
+
+
+async def submit_job(ctx, kind, payload, shard_key=None, ack=None, broadcast=False):
+    """Queue a job for the worker owning shard_key; the result is posted to ctx's channel.
+
+    Jobs from users pass through the scheduler's quotas first; scheduled jobs
+    (ctx is None) go straight to the queue. With broadcast, every worker gets
+    a copy with its shard number added to the payload. Returns True if the
+    job was queued.
+    """
+    if ctx is None:
+        channel_id, priority = strategy_channel.id, JOB_PRIORITIES[kind]
+    else:
+        guild_id = ctx.guild.id if ctx.guild else None
+        priority, reason = await asyncio.to_thread(
+            scheduler.admit, kind, ctx.author.id, guild_id
+        )
+        if priority is None:
+            await ctx.send(reason)
+            return False
+        channel_id = ctx.channel.id
+        if ack:
+            await ctx.send(ack)
+
+    if not broadcast:
+        jobs = [(payload, shard_for(shard_key))]
+    elif isinstance(job_queue, MemoryJobQueue):
+        jobs = [(dict(payload, shard=0), 0)]  # In-process workers share one process
+    else:
+        jobs = [(dict(payload, shard=shard), shard) for shard in range(NUM_WORKERS)]
+    for job_payload, shard in jobs:
+        await asyncio.to_thread(
+            job_queue.enqueue, kind, job_payload, channel_id, shard, priority
+        )
+    return True
 
 
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user}")
     await bot.change_presence(activity=discord.Game(name="!help for commands"))
+    if not deliver_results.is_running():
+        deliver_results.start()
+    if not check_alerts.is_running():
+        check_alerts.start()
+
+
+@tasks.loop(seconds=RESULT_POLL_INTERVAL)
+async def deliver_results():
+    """Send worker results to the channels that requested them.
+
+    Results are acknowledged only once sent. A result that fails to send is
+    retried on the next tick, and the rest of its channel waits behind it so
+    messages stay in order; one whose channel is gone or forbidden is dropped.
+    """
+    try:
+        results = await asyncio.to_thread(job_queue.pending_results)
+    except Exception as e:
+        print(f"Error reading results: {str(e)}")
+        return
+    sent, blocked = [], set()
+    for result in results:
+        if result["channel_id"] in blocked:
+            continue
+        try:
+            channel = bot.get_channel(result["channel_id"]) or await bot.fetch_channel(
+                result["channel_id"]
+            )
+            await channel.send(result["content"])
+        except (discord.NotFound, discord.Forbidden) as e:
+            print(f"Dropping result for job {result['job_id']}: {str(e)}")
+        except Exception as e:
+            print(f"Error delivering result for job {result['job_id']}, will retry: {str(e)}")
+            blocked.add(result["channel_id"])
+            continue
+        sent.append(result["id"])
+    if sent:
+        try:
+            await asyncio.to_thread(job_queue.ack_results, sent)
+        except Exception as e:
+            print(f"Error acknowledging results: {str(e)}")
+
+
+@tasks.loop(seconds=ALERT_CHECK_INTERVAL)
+async def check_alerts():
+    """Evaluate all alerts against a fresh snapshot and DM matched users."""
+    tickers = alert_engine.get_tickers()
+    if not tickers:
+        return
+
+    results = await asyncio.gather(
+        *(get_technical_indicators.run_async(ticker) for ticker in tickers),
+        return_exceptions=True,
+    )
+    snapshot = {
+        ticker: data for ticker, data in zip(tickers, results) if isinstance(data, dict)
+    }
+    matches = alert_engine.evaluate(snapshot)
+
+    by_user = {}
+    for alert, value in matches:
+        by_user.setdefault(alert["user_id"], []).append((alert, value))
+    for user_id, user_matches in by_user.items():
+        try:
+            user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+            for chunk in split_message(format_triggered_alerts(user_matches)):
+                await user.send(chunk)
+        except Exception as e:
+            print(f"Error sending alerts to {user_id}: {str(e)}")
 
 
 @bot.command(name="start")
@@ -40,9 +165,15 @@ async def start(ctx):
         "🔹 `!sell <TICKER> <QUANTITY>` → Sell shares\n"
         "🔹 `!position <TICKER>` → Check your position\n"
         "🔹 `!account` → View account info\n"
-        "🔹 `!gainers` → View top gaining stocks\n"
-        "🔹 `!momentum` → View high momentum stocks\n"
-        "🔹 `!buyers` → View stocks with strong buying activity\n"
+        "🔹 `!gainers [LIMIT] [compact]` → View top gaining stocks\n"
+        "🔹 `!momentum [LIMIT] [compact]` → View high momentum stocks\n"
+        "🔹 `!buyers [LIMIT] [compact]` → View stocks with strong buying activity\n"
+        "🔹 `!correlated <TICKER> [LIMIT]` → Most correlated S&P 500 names\n"
+        "🔹 `!pairs [LIMIT]` → Cointegrated pairs across the S&P 500\n"
+        "🔹 `!alert <TICKER> <FIELD> <above|below> <VALUE>` → DM me when it triggers\n"
+        "🔹 `!alerts` / `!unalert <ID>` → List or remove your alerts\n"
+        "🔹 `!strategy <start|stop|run|status>` → Control automated trading (admins)\n"
+        "🔹 `!stats` → View coalescing, provider, scheduler, dependency and AI model statistics\n"
         "🔹 `!help` → See all commands"
     )
     await ctx.send(welcome_msg)
@@ -51,84 +182,28 @@ async def start(ctx):
 @bot.command(name="trade")
 async def trade(ctx, ticker: str):
     """Get AI-powered trade insights for a stock."""
-    user_id = ctx.author.id
-    current_time = datetime.now()
-
-    # Check cooldown
-    if user_id in last_trade_time:
-        time_since_last = (current_time - last_trade_time[user_id]).total_seconds()
-        if time_since_last < TRADE_COOLDOWN:
-            remaining = int(TRADE_COOLDOWN - time_since_last)
-            await ctx.send(
-                f"⏳ Please wait {remaining} seconds before requesting another trade analysis."
-            )
-            return
-
-    try:
-        # Update last trade time
-        last_trade_time[user_id] = current_time
-
-        # Send acknowledgment
-        await ctx.send(f"🔄 Analyzing {ticker}... Please wait.")
-
-        # Get stock data
-        technical_data = get_technical_indicators(ticker)
-        stock_info = get_stock_info(ticker)
-
-        # Get news sentiment with delay
-        news_sentiment = analyze_sentiment(f"Recent news about {ticker}")
-        await asyncio.sleep(2)  # Add small delay between API calls
-
-        # Get AI trading decision
-        decision = ai_trading_decision(ticker, technical_data, news_sentiment)
-
-        # Generate summary
-        summary = generate_trade_summary(ticker, decision, technical_data)
-
-        # Add stock info
-        summary += f"""
-📈 Stock Information:
-   • Name: {stock_info['name']}
-   • Sector: {stock_info['sector']}
-   • Industry: {stock_info['industry']}
-   • Market Cap: ${stock_info['market_cap']:,.2f}
-   • P/E Ratio: {stock_info['pe_ratio']}
-   • Dividend Yield: {stock_info['dividend_yield']}
-"""
-
-        await ctx.send(summary)
-    except Exception as e:
-        await ctx.send(f"❌ Error analyzing {ticker}: {str(e)}")
-        # Reset cooldown on error
-        if user_id in last_trade_time:
-            del last_trade_time[user_id]
+    await submit_job(
+        ctx, "trade", {"ticker": ticker}, ticker, ack=f"🔄 Analyzing {ticker}... Please wait."
+    )
 
 
 @bot.command(name="buy")
 async def buy(ctx, ticker: str, quantity: int = None):
     """Buy shares of a stock."""
-    try:
-        response = execute_trade(ticker, "buy", quantity)
-        await ctx.send(response)
-    except Exception as e:
-        await ctx.send(f"❌ Error executing buy order: {str(e)}")
+    await submit_job(ctx, "order", {"ticker": ticker, "side": "buy", "quantity": quantity}, ticker)
 
 
 @bot.command(name="sell")
 async def sell(ctx, ticker: str, quantity: int = None):
     """Sell shares of a stock."""
-    try:
-        response = execute_trade(ticker, "sell", quantity)
-        await ctx.send(response)
-    except Exception as e:
-        await ctx.send(f"❌ Error executing sell order: {str(e)}")
+    await submit_job(ctx, "order", {"ticker": ticker, "side": "sell", "quantity": quantity}, ticker)
 
 
 @bot.command(name="position")
 async def position(ctx, ticker: str):
     """Check your position in a stock."""
     try:
-        position = get_position(ticker)
+        position = await get_position.run_async(ticker)
         if position:
             msg = f"""
 📊 **Position in {ticker}**
@@ -149,7 +224,7 @@ async def position(ctx, ticker: str):
 async def account(ctx):
     """View account information."""
     try:
-        info = get_account_info()
+        info = await get_account_info.run_async()
         msg = f"""
 💰 **Account Information**
    • Cash: ${info['cash']:.2f}
@@ -157,59 +232,169 @@ async def account(ctx):
    • Number of Positions: {len(info['positions'])}
 """
         await ctx.send(msg)
+
+        analytics = await asyncio.to_thread(
+            get_portfolio_analytics, info["positions"], info["portfolio_value"]
+        )
+        for chunk in split_message(format_portfolio_analytics(analytics)):
+            await ctx.send(chunk)
     except Exception as e:
         await ctx.send(f"❌ Error fetching account info: {str(e)}")
 
 
+async def submit_scan(ctx, scan, limit, style, ack):
+    """Queue a watchlist scan; `style` is 'full' or 'compact' (table)."""
+    payload = {"scan": scan, "limit": limit, "compact": style.lower() == "compact"}
+    await submit_job(ctx, "scan", payload, f"scan:{scan}", ack=ack)
+
+
 @bot.command(name="gainers")
-async def gainers(ctx, limit: int = 10):
+async def gainers(ctx, limit: int = 10, style: str = "full"):
     """Get top gaining stocks."""
-    try:
-        await ctx.send("🔍 Scanning market for top gainers...")
-        top_gainers = get_top_gainers(limit)
-        if isinstance(top_gainers, str):  # Error message
-            await ctx.send(f"❌ {top_gainers}")
-        else:
-            message = format_watchlist_message(
-                top_gainers, "Today's Top Gainers 📈", "gainers"
-            )
-            await ctx.send(message)
-    except Exception as e:
-        await ctx.send(f"❌ Error fetching top gainers: {str(e)}")
+    await submit_scan(ctx, "gainers", limit, style, "🔍 Scanning market for top gainers...")
 
 
 @bot.command(name="momentum")
-async def momentum(ctx, limit: int = 10):
+async def momentum(ctx, limit: int = 10, style: str = "full"):
     """Get stocks with highest daily momentum."""
-    try:
-        await ctx.send("🔍 Scanning market for momentum stocks...")
-        momentum_stocks = get_momentum_stocks(limit)
-        if isinstance(momentum_stocks, str):  # Error message
-            await ctx.send(f"❌ {momentum_stocks}")
-        else:
-            message = format_watchlist_message(
-                momentum_stocks, "Today's Top Momentum Stocks 🚀", "momentum"
-            )
-            await ctx.send(message)
-    except Exception as e:
-        await ctx.send(f"❌ Error fetching momentum stocks: {str(e)}")
+    await submit_scan(ctx, "momentum", limit, style, "🔍 Scanning market for momentum stocks...")
 
 
 @bot.command(name="buyers")
-async def buyers(ctx, limit: int = 10):
+async def buyers(ctx, limit: int = 10, style: str = "full"):
     """Get stocks with highest buyer activity."""
+    await submit_scan(
+        ctx, "buyers", limit, style, "🔍 Scanning market for stocks with strong buying activity..."
+    )
+
+
+@bot.command(name="correlated")
+async def correlated(ctx, ticker: str, limit: int = 10):
+    """Find the S&P 500 names most correlated with a ticker."""
+    # All correlation jobs go to one shard so a single worker keeps the matrix warm
+    await submit_job(
+        ctx,
+        "correlation",
+        {"scan": "correlated", "ticker": ticker.upper(), "limit": limit},
+        "correlation",
+        ack=f"🔍 Computing correlations for {ticker.upper()}...",
+    )
+
+
+@bot.command(name="pairs")
+async def pairs(ctx, limit: int = 10):
+    """Find cointegrated pairs across the S&P 500."""
+    await submit_job(
+        ctx,
+        "correlation",
+        {"scan": "pairs", "limit": limit},
+        "correlation",
+        ack="🔍 Scanning the universe for cointegrated pairs...",
+    )
+
+
+@bot.command(name="alert")
+async def alert(ctx, ticker: str, field: str, condition: str, threshold: float):
+    """Get a DM when a price or indicator crosses a threshold."""
     try:
-        await ctx.send("🔍 Scanning market for stocks with strong buying activity...")
-        buyer_stocks = get_buyer_activity(limit)
-        if isinstance(buyer_stocks, str):  # Error message
-            await ctx.send(f"❌ {buyer_stocks}")
-        else:
-            message = format_watchlist_message(
-                buyer_stocks, "Stocks with Strong Buying Activity 💪", "buyers"
-            )
-            await ctx.send(message)
-    except Exception as e:
-        await ctx.send(f"❌ Error fetching buyer activity: {str(e)}")
+        new_alert = alert_engine.add_alert(ctx.author.id, ticker, field, condition, threshold)
+        await ctx.send(f"🔔 Alert set: {format_alert(new_alert)}")
+    except ValueError as e:
+        await ctx.send(f"❌ {str(e)}")
+
+
+@bot.command(name="alerts")
+async def alerts(ctx):
+    """List your active alerts."""
+    user_alerts = alert_engine.get_user_alerts(ctx.author.id)
+    if not user_alerts:
+        await ctx.send("No active alerts. Use `!alert <TICKER> <field> <above|below> <value>`.")
+        return
+    msg = "🔔 **Your Alerts**\n" + "".join(f"   • {format_alert(a)}\n" for a in user_alerts)
+    for chunk in split_message(msg):
+        await ctx.send(chunk)
+
+
+@bot.command(name="unalert")
+async def unalert(ctx, alert_id: int):
+    """Remove one of your alerts."""
+    if alert_engine.remove_alert(alert_id, ctx.author.id):
+        await ctx.send(f"🗑️ Alert #{alert_id} removed.")
+    else:
+        await ctx.send(f"❌ No alert #{alert_id} found.")
+
+
+@tasks.loop(minutes=STRATEGY_INTERVAL_MINUTES)
+async def strategy_loop():
+    """Queue one strategy cycle; the report goes to the channel that started it."""
+    await submit_job(None, "strategy", {}, "strategy")
+
+
+@bot.command(name="strategy")
+@commands.has_permissions(manage_guild=True)
+async def strategy(ctx, action: str = "status"):
+    """Control the automated strategy: start, stop, run or status."""
+    global strategy_channel
+    action = action.lower()
+    mode = "dry run" if STRATEGY_DRY_RUN else "LIVE"
+    if action == "start":
+        strategy_channel = ctx.channel
+        if not strategy_loop.is_running():
+            strategy_loop.start()
+        await ctx.send(f"▶️ Strategy started ({mode}, every {STRATEGY_INTERVAL_MINUTES} min).")
+    elif action == "stop":
+        strategy_loop.cancel()
+        await ctx.send("⏹️ Strategy stopped.")
+    elif action == "run":
+        await submit_job(
+            ctx, "strategy", {}, "strategy", ack=f"🔄 Running one strategy cycle ({mode})..."
+        )
+    else:
+        state = "running" if strategy_loop.is_running() else "stopped"
+        await ctx.send(f"🤖 Strategy is {state} ({mode}).")
+
+
+@bot.command(name="stats")
+async def stats(ctx):
+    """Show request coalescing, provider, scheduler, dependency and AI model statistics."""
+    metrics = get_metrics()
+    totals = metrics["totals"]
+    msg = (
+        "📡 **Request Coalescing**\n"
+        f"   • Calls: {totals['calls']}\n"
+        f"   • Executed: {totals['executions']}\n"
+        f"   • Saved: {totals['shared']}\n"
+        f"   • Errors: {totals['errors']}\n"
+        f"   • In Flight: {metrics['in_flight']}\n"
+    )
+    busiest = sorted(metrics["functions"].items(), key=lambda x: -x[1]["shared"])[:5]
+    for name, fn_stats in busiest:
+        msg += f"   • {name.split('.')[-1]}: {fn_stats['shared']}/{fn_stats['calls']} shared\n"
+
+    msg += "\n📶 **Market Data Providers**\n"
+    for name, provider_stats in data_router.get_stats().items():
+        latency = provider_stats["latency"]
+        latency_text = f"{latency * 1000:.0f}ms" if latency is not None else "n/a"
+        msg += (
+            f"   • {name}: {latency_text} avg, {provider_stats['calls']} calls, "
+            f"{provider_stats['failures']} failures, {provider_stats['hedged_wins']} hedged wins\n"
+        )
+
+    scheduler_stats = await asyncio.to_thread(scheduler.get_stats)
+    msg += "\n🚦 **Scheduler**\n"
+    for name, counts in scheduler_stats["classes"].items():
+        msg += (
+            f"   • {name}: {counts['admitted']} admitted, {counts['throttled']} throttled, "
+            f"{counts['shed']} shed, {counts['queued']} queued\n"
+        )
+
+    dependency_stats = get_dependency_stats()
+    if dependency_stats:
+        msg += "\n🛡️ **Dependencies (gateway)**\n" + format_dependency_stats(dependency_stats)
+    await ctx.send(msg)
+
+    # AI model usage is tracked inside the workers, so each one reports its own
+    await submit_job(ctx, "stats", {}, broadcast=True)
 
 
 @bot.event
@@ -223,5 +408,17 @@ async def on_command_error(ctx, error):
         await ctx.send(f"❌ An error occurred: {str(error)}")
 
 
-# Run the bot
-bot.run(DISCORD_TOKEN)
+if __name__ == "__main__":
+    # Start the worker pool unless workers run separately (START_WORKERS=false);
+    # the in-memory queue can only be served by in-process workers
+    if START_WORKERS or isinstance(job_queue, MemoryJobQueue):
+        start_workers(job_queue)
+    # One process keeps the shared market snapshot fresh for the gateway and workers
+    if START_SNAPSHOT_WRITER:
+        start_snapshot_writer()
+    # A single process writes the warehouse
+    if START_WAREHOUSE_UPDATER:
+        start_warehouse_updater()
+
+    # Run the bot
+    bot.run(DISCORD_TOKEN)
@@ -0,0 +1,311 @@
+import os
+import threading
+from datetime import date
+import numpy as np
+import pandas as pd
+from market_data import get_daily_closes
+from watchlist import get_sp500_tickers
+from config.config import (
+    CORRELATION_HISTORY,
+    CORRELATION_WINDOW,
+    COINTEGRATION_WINDOW,
+    CORRELATION_MAX_MISSING,
+    CORRELATION_BLOCK,
+    PAIRS_MIN_CORRELATION,
+    PAIRS_CANDIDATES,
+    COINTEGRATION_CRITICAL,
+    CORRELATION_CACHE_PATH,
+)
+
+INCREMENTAL_PERIOD = "1mo"  # Closes fetched for a daily refresh
+
+
+def blocked_gram(matrix, block=CORRELATION_BLOCK):
+    """matrix.T @ matrix, computed one block of columns at a time.
+
+    Only blocks on or above the diagonal are multiplied; the rest are
+    mirrored, and temporaries stay at block x block.
+    """
+    n = matrix.shape[1]
+    gram = np.empty((n, n))
+    for i in range(0, n, block):
+        for j in range(i, n, block):
+            product = matrix[:, i:i + block].T @ matrix[:, j:j + block]
+            gram[i:i + block, j:j + block] = product
+            gram[j:j + block, i:i + block] = product.T
+    return gram
+
+
+def engle_granger(y, x):
+    """Engle-Granger cointegration test for each column pair of y and x.
+
+    Regresses y on x, then runs a Dickey-Fuller regression on the residual
+    spread, all as column-wise array operations. Returns the DF t-statistic
+    (more negative is stronger), hedge ratio, half-life of mean reversion in
+    days and the spread's current z-score, one value per column.
+    """
+    xc, yc = x - x.mean(axis=0), y - y.mean(axis=0)
+    beta = (xc * yc).sum(axis=0) / (xc * xc).sum(axis=0)
+    spread = yc - beta * xc
+    lagged, delta = spread[:-1], np.diff(spread, axis=0)
+    lagged_ss = (lagged * lagged).sum(axis=0)
+    gamma = (lagged * delta).sum(axis=0) / lagged_ss
+    residual = delta - gamma * lagged
+    std_error = np.sqrt((residual * residual).sum(axis=0) / (len(delta) - 1) / lagged_ss)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        half_life = np.where(gamma < 0, -np.log(2) / np.log1p(gamma), np.inf)
+        zscore = spread[-1] / spread.std(axis=0)
+    return gamma / std_error, beta, half_life, zscore
+
+
+class CorrelationScanner:
+    """Rolling return correlations and cointegrated pairs across the S&P 500.
+
+    Keeps the last COINTEGRATION_WINDOW days of log closes for the universe
+    plus the sum and cross-product of the last CORRELATION_WINDOW daily
+    returns. The daily refresh fetches only recent closes and updates those
+    sums with the returns entering and leaving the window, so the
+    correlation matrix is one O(N^2) step from them. State is saved to
+    CORRELATION_CACHE_PATH and reused across restarts and workers. All state,
+    including the cached matrix and pairs, is read and replaced under one
+    lock, since a worker serves several jobs at once.
+    """
+
+    def __init__(self, path=CORRELATION_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.universe = []  # Index members at the last rebuild, kept or not
+        self.symbols = []
+        self.dates = np.array([], dtype="datetime64[ns]")
+        self.log_prices = np.empty((0, 0))
+        self.return_sum = np.empty(0)
+        self.return_cross = np.empty((0, 0))
+        self.count = 0
+        self.refreshed_on = ""
+        self._correlation = None
+        self._pairs = None
+        self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                self.symbols = data["symbols"].tolist()
+                self.dates = data["dates"]
+                self.log_prices = data["log_prices"]
+                self.return_sum = data["return_sum"]
+                self.return_cross = data["return_cross"]
+                self.count = int(data["count"])
+                self.refreshed_on = str(data["refreshed_on"])
+                # Caches saved before the universe was stored get rebuilt
+                self.universe = data["universe"].tolist() if "universe" in data else []
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    universe=np.array(self.universe, dtype=str),
+                    symbols=np.array(self.symbols, dtype=str),
+                    dates=self.dates,
+                    log_prices=self.log_prices,
+                    return_sum=self.return_sum,
+                    return_cross=self.return_cross,
+                    count=np.array(self.count),
+                    refreshed_on=np.array(self.refreshed_on),
+                )
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving correlation cache: {str(e)}")
+
+    @staticmethod
+    def _completed_sessions(closes):
+        """Drop today's (possibly still moving) bar."""
+        index = closes.index.tz_localize(None) if closes.index.tz is not None else closes.index
+        return closes[index.normalize() < pd.Timestamp(date.today())]
+
+    def _rebuild(self, universe):
+        closes = self._completed_sessions(get_daily_closes(universe, CORRELATION_HISTORY))
+        closes = closes.iloc[-(COINTEGRATION_WINDOW + 1):]
+        closes = closes.loc[:, closes.isna().mean() <= CORRELATION_MAX_MISSING]
+        self.universe = list(universe)
+        self.symbols = list(closes.columns)
+        self.dates = closes.index.values.astype("datetime64[ns]")
+        self.log_prices = np.log(closes.ffill().to_numpy(dtype=float))
+        window = np.nan_to_num(np.diff(self.log_prices, axis=0))[-CORRELATION_WINDOW:]
+        self.return_sum = window.sum(axis=0)
+        self.return_cross = blocked_gram(window)
+        self.count = len(window)
+
+    def _append(self, closes):
+        """Roll the window forward over sessions after the last stored date.
+
+        Returns False, changing nothing, if the closes do not reach back to
+        the last stored date: sessions in between would be missed.
+        """
+        closes = self._completed_sessions(closes).reindex(columns=self.symbols)
+        dates = closes.index.values.astype("datetime64[ns]")
+        if not (dates == self.dates[-1]).any():
+            return False
+        closes = closes[dates > self.dates[-1]]
+        if closes.empty:
+            return True
+        combined = np.vstack([self.log_prices, np.log(closes.to_numpy(dtype=float))])
+        combined = pd.DataFrame(combined).ffill().to_numpy()
+        returns = np.nan_to_num(np.diff(combined, axis=0))
+        old_total, new_total = len(self.log_prices) - 1, len(returns)
+        entering = returns[old_total:]
+        leaving = returns[max(0, old_total - CORRELATION_WINDOW):max(0, new_total - CORRELATION_WINDOW)]
+        self.return_sum = self.return_sum + entering.sum(axis=0) - leaving.sum(axis=0)
+        self.return_cross = self.return_cross + blocked_gram(entering) - blocked_gram(leaving)
+        self.count = min(CORRELATION_WINDOW, new_total)
+        dates = np.concatenate([self.dates, closes.index.values.astype("datetime64[ns]")])
+        self.log_prices = combined[-(COINTEGRATION_WINDOW + 1):]
+        self.dates = dates[-(COINTEGRATION_WINDOW + 1):]
+        return True
+
+    def refresh(self):
+        """Bring the state up to date once per day: incrementally, or rebuilt if the universe changed
+        or the state is older than INCREMENTAL_PERIOD reaches back."""
+        with self._lock:
+            today = date.today().isoformat()
+            if self.refreshed_on == today and self.count:
+                return
+            universe = get_sp500_tickers()
+            # Rebuild when members join as well as when they leave, or when the
+            # state is older than the incremental fetch covers
+            if (not self.count or set(universe) != set(self.universe)
+                    or not self._append(get_daily_closes(self.symbols, INCREMENTAL_PERIOD))):
+                self._rebuild(universe)
+            self.refreshed_on = today
+            self._correlation = None
+            self._pairs = None
+            self.save()
+
+    def correlation(self):
+        """Correlation matrix of the rolling return window, cached until the next refresh."""
+        with self._lock:
+            return self._correlation_matrix()
+
+    def _correlation_matrix(self):
+        # Caller holds self._lock
+        if self._correlation is None:
+            n = self.count
+            mean = self.return_sum / n
+            covariance = (self.return_cross - n * np.outer(mean, mean)) / (n - 1)
+            std = np.sqrt(np.clip(np.diag(covariance), 1e-18, None))
+            correlation = np.clip(covariance / np.outer(std, std), -1.0, 1.0)
+            np.fill_diagonal(correlation, 1.0)
+            self._correlation = correlation
+        return self._correlation
+
+    @staticmethod
+    def _outside_row(ticker, dates, log_prices, count):
+        """Correlations of a ticker outside the universe against every member."""
+        closes = get_daily_closes([ticker], CORRELATION_HISTORY)[ticker]
+        closes = closes.reindex(pd.DatetimeIndex(dates)).ffill()
+        returns = np.nan_to_num(np.diff(np.log(closes.to_numpy(dtype=float))))[-count:]
+        window = np.nan_to_num(np.diff(log_prices, axis=0))[-count:]
+        returns, window = returns - returns.mean(), window - window.mean(axis=0)
+        denominator = np.sqrt((returns ** 2).sum() * (window ** 2).sum(axis=0))
+        return np.divide(returns @ window, denominator, out=np.zeros(log_prices.shape[1]), where=denominator > 0)
+
+    def get_correlated(self, ticker, limit=10):
+        """Most and least correlated members of the universe for a ticker."""
+        self.refresh()
+        ticker = ticker.upper()
+        # Take a consistent view; a refresh replaces these arrays rather than changing them
+        with self._lock:
+            symbols, dates, log_prices, count = self.symbols, self.dates, self.log_prices, self.count
+            correlation = self._correlation_matrix()
+        if ticker in symbols:
+            row = correlation[symbols.index(ticker)].copy()
+            row[symbols.index(ticker)] = np.nan
+        else:
+            row = self._outside_row(ticker, dates, log_prices, count)
+        valid = np.flatnonzero(~np.isnan(row))
+        order = valid[np.argsort(-row[valid])]
+        return {
+            "ticker": ticker,
+            "window": count,
+            "correlated": [
+                {"ticker": symbols[i], "correlation": float(row[i])} for i in order[:limit]
+            ],
+            "inverse": [
+                {"ticker": symbols[i], "correlation": float(row[i])} for i in order[::-1][:3]
+            ],
+        }
+
+    def get_pairs(self, limit=10):
+        """Highly correlated pairs that also pass the cointegration test, strongest first."""
+        self.refresh()
+        with self._lock:
+            return self._cointegrated_pairs()[:limit]
+
+    def _cointegrated_pairs(self):
+        # Caller holds self._lock
+        if self._pairs is None:
+            correlation = self._correlation_matrix()
+            upper_i, upper_j = np.triu_indices(len(self.symbols), k=1)
+            values = correlation[upper_i, upper_j]
+            complete = ~np.isnan(self.log_prices).any(axis=0)
+            candidates = np.flatnonzero(
+                (values >= PAIRS_MIN_CORRELATION) & complete[upper_i] & complete[upper_j]
+            )
+            if len(candidates) > PAIRS_CANDIDATES:
+                top = np.argpartition(-values[candidates], PAIRS_CANDIDATES)[:PAIRS_CANDIDATES]
+                candidates = candidates[top]
+            i, j = upper_i[candidates], upper_j[candidates]
+            t_stat, beta, half_life, zscore = engle_granger(self.log_prices[:, i], self.log_prices[:, j])
+            passed = np.flatnonzero(t_stat < COINTEGRATION_CRITICAL)
+            passed = passed[np.argsort(t_stat[passed])]
+            self._pairs = [
+                {
+                    "pair": (self.symbols[i[k]], self.symbols[j[k]]),
+                    "correlation": float(values[candidates[k]]),
+                    "t_stat": float(t_stat[k]),
+                    "hedge_ratio": float(beta[k]),
+                    "half_life": float(half_life[k]),
+                    "zscore": float(zscore[k]),
+                }
+                for k in passed
+            ]
+        return self._pairs
+
+
+scanner = CorrelationScanner()
+
+
+def format_correlated(result):
+    """Format a !correlated result for Discord."""
+    message = (
+        f"🔗 **Most Correlated with {result['ticker']}** "
+        f"({result['window']}-day daily returns)\n"
+    )
+    for i, entry in enumerate(result["correlated"], 1):
+        message += f"{i}. {entry['ticker']}: {entry['correlation']:+.2f}\n"
+    if result["inverse"]:
+        message += "\n↔️ **Least Correlated**\n"
+        for entry in result["inverse"]:
+            message += f"   • {entry['ticker']}: {entry['correlation']:+.2f}\n"
+    return message
+
+
+def format_pairs(pairs):
+    """Format cointegrated pairs for Discord."""
+    if not pairs:
+        return "No cointegrated pairs found in the universe today."
+    message = "👯 **Cointegrated Pairs**\n"
+    for i, pair in enumerate(pairs, 1):
+        first, second = pair["pair"]
+        half_life = f"{pair['half_life']:.1f}d" if np.isfinite(pair["half_life"]) else "n/a"
+        message += (
+            f"{i}. {first} / {second}\n"
+            f"   • Correlation: {pair['correlation']:.2f} | ADF t: {pair['t_stat']:.2f}\n"
+            f"   • Hedge Ratio: {pair['hedge_ratio']:.2f} | Half-life: {half_life} | "
+            f"Spread z: {pair['zscore']:+.2f}\n"
+        )
+    return message
@@ -0,0 +1,391 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+import pandas as pd
+import yfinance as yf
+from config.config import (
+    APCA_API_KEY_ID,
+    APCA_API_SECRET_KEY,
+    REPLAY_DATA_DIR,
+    MARKET_DATA_PROVIDERS,
+    HEDGE_DELAYS,
+    PROVIDER_FAILURE_COOLDOWN,
+    LATENCY_EWMA_ALPHA,
+)
+from resilience import (
+    get_dependency,
+    submit,
+    remaining,
+    check_deadline,
+    ResilienceError,
+    CircuitOpenError,
+    DeadlineExceeded,
+)
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+EXCHANGE_TIMEZONE = "America/New_York"
+
+# Approximate trading days per yfinance period unit
+PERIOD_DAYS = {'d': 1, 'wk': 5, 'mo': 21, 'y': 252}
+
+
+def period_to_days(period):
+    """Convert a yfinance period string such as '5d' or '1y' to trading days."""
+    for unit in ('wk', 'mo', 'd', 'y'):
+        if period.endswith(unit):
+            return int(period[:-len(unit)]) * PERIOD_DAYS[unit]
+    return None  # 'max' and 'ytd' return everything available
+
+
+class NoDataError(Exception):
+    """A provider answered without any bars for the request."""
+
+    pass
+
+
+def parse_recorded_index(index):
+    """Timestamps read back from a recording as a DatetimeIndex.
+
+    Recordings from yfinance carry UTC offsets that change across DST, which
+    pandas leaves as plain strings; those are converted to exchange time.
+    Naive timestamps are kept as they are.
+    """
+    if len(index) and pd.Timestamp(index[0]).tzinfo is not None:
+        return pd.to_datetime(index, utc=True).tz_convert(EXCHANGE_TIMEZONE)
+    return pd.to_datetime(index)
+
+
+class MarketDataProvider:
+    """Interface for a source of bars, quotes and fundamentals.
+
+    Bars are DataFrames with Open/High/Low/Close/Volume columns indexed by
+    timestamp. Quotes are dicts with bid, ask and last prices. Operations a
+    provider cannot serve raise NotImplementedError so the router skips it.
+    Calls to a provider with a `dependency` go through that resilience
+    policy (retries and circuit breaker).
+    """
+
+    name = "base"
+    dependency = None
+
+    def get_bars(self, ticker, period="1d", interval="1m"):
+        raise NotImplementedError
+
+    def get_bars_multi(self, tickers, period="3mo", interval="1d"):
+        """Bars for several tickers as a DataFrame with (field, ticker) columns."""
+        return pd.concat(
+            {t: self.get_bars(t, period, interval) for t in tickers}, axis=1
+        ).swaplevel(axis=1)
+
+    def get_quote(self, ticker):
+        raise NotImplementedError
+
+    def get_fundamentals(self, ticker):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance through yfinance.
+
+    yfinance logs failed requests and returns empty frames by default, which
+    would look like a good answer to the router; errors are raised instead,
+    and empty results raise NoDataError.
+    """
+
+    name = "yfinance"
+    dependency = "yahoo"
+
+    def __init__(self):
+        yf.config.debug.hide_exceptions = False
+
+    def get_bars(self, ticker, period="1d", interval="1m"):
+        data = yf.Ticker(ticker).history(period=period, interval=interval)
+        if data.empty:
+            raise NoDataError(f"No {interval} bars for {ticker} from Yahoo Finance")
+        return data
+
+    def get_bars_multi(self, tickers, period="3mo", interval="1d"):
+        tickers = list(tickers)
+        # download() catches errors per ticker and leaves their columns all-NaN;
+        # a batch with nothing in it is a failed request, not a set of missing symbols
+        data = yf.download(tickers, period=period, interval=interval, progress=False)
+        closes = data["Close"] if "Close" in data else pd.DataFrame()
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame()
+        if closes.reindex(columns=[t.upper() for t in tickers]).isna().all().all():
+            raise NoDataError(f"No {interval} bars for {len(tickers)} tickers from Yahoo Finance")
+        return data
+
+    def get_quote(self, ticker):
+        # Yahoo has no top-of-book quote; use the latest trade on both sides
+        data = yf.Ticker(ticker).history(period="1d", interval="1m")
+        if data.empty:
+            raise Exception(f"No recent trades for {ticker}")
+        last = float(data["Close"].iloc[-1])
+        return {"bid": last, "ask": last, "last": last}
+
+    def get_fundamentals(self, ticker):
+        info = yf.Ticker(ticker).info
+
+        def value(key, default="N/A"):
+            # Yahoo reports missing fields as absent keys or explicit None
+            result = info.get(key)
+            return default if result is None else result
+
+        return {
+            "name": value("longName", ticker),
+            "sector": value("sector"),
+            "industry": value("industry"),
+            "market_cap": value("marketCap"),
+            "pe_ratio": value("forwardPE"),
+            "dividend_yield": value("dividendYield"),
+        }
+
+
+class AlpacaProvider(MarketDataProvider):
+    """Alpaca market data API (bars and top-of-book quotes)."""
+
+    name = "alpaca"
+    dependency = "alpaca_data"
+
+    def __init__(self):
+        import alpaca_trade_api as tradeapi
+
+        self.tradeapi = tradeapi
+        self.api = tradeapi.REST(APCA_API_KEY_ID, APCA_API_SECRET_KEY)
+
+    def _timeframe(self, interval):
+        timeframes = {
+            "1m": self.tradeapi.TimeFrame.Minute,
+            "1h": self.tradeapi.TimeFrame.Hour,
+            "1d": self.tradeapi.TimeFrame.Day,
+        }
+        if interval not in timeframes:
+            raise NotImplementedError
+        return timeframes[interval]
+
+    def get_bars(self, ticker, period="1d", interval="1m"):
+        days = period_to_days(period) or 252 * 5
+        # Calendar days covering the trading days requested, plus weekends/holidays
+        start = (datetime.utcnow() - timedelta(days=days * 7 // 5 + 4)).strftime("%Y-%m-%d")
+        df = self.api.get_bars(ticker, self._timeframe(interval), start=start).df
+        df = df.rename(columns={c.lower(): c for c in BAR_COLUMNS})[BAR_COLUMNS]
+        if df.empty:
+            return df
+        dates = df.index.normalize().unique()
+        return df[df.index >= dates[-min(days, len(dates))]]
+
+    def get_quote(self, ticker):
+        quote = self.api.get_latest_quote(ticker)
+        bid, ask = float(quote.bid_price), float(quote.ask_price)
+        return {"bid": bid, "ask": ask, "last": (bid + ask) / 2}
+
+
+class ReplayProvider(MarketDataProvider):
+    """Recorded bars from CSV files: <TICKER>.csv daily, <TICKER>_<interval>.csv intraday."""
+
+    name = "replay"
+
+    def __init__(self, directory=REPLAY_DATA_DIR):
+        self.directory = directory
+
+    def path(self, ticker, interval="1d"):
+        suffix = "" if interval == "1d" else f"_{interval}"
+        return os.path.join(self.directory, f"{ticker.upper()}{suffix}.csv")
+
+    def get_tickers(self):
+        """Tickers that have recorded daily bars."""
+        return sorted(
+            name[:-4] for name in os.listdir(self.directory)
+            if name.endswith('.csv') and '_' not in name
+        )
+
+    def get_bars(self, ticker, period="1d", interval="1m"):
+        """Load recorded bars, keeping the last `period` worth of trading days.
+
+        Intraday requests without an intraday recording get the full daily
+        history instead, so indicators still have enough bars to warm up.
+        """
+        path = self.path(ticker, interval)
+        days = period_to_days(period)
+        if not os.path.exists(path):
+            path = self.path(ticker, "1d")
+            days = None
+        df = pd.read_csv(path, index_col=0)
+        df.index = parse_recorded_index(df.index)
+        if days is None or df.empty:
+            return df
+        dates = df.index.normalize().unique()
+        return df[df.index >= dates[-min(days, len(dates))]]
+
+    def get_quote(self, ticker):
+        last = float(self.get_bars(ticker, "5d", "1d")["Close"].iloc[-1])
+        return {"bid": last, "ask": last, "last": last}
+
+    def get_fundamentals(self, ticker):
+        try:
+            with open(os.path.join(self.directory, "fundamentals.json")) as f:
+                return json.load(f)[ticker.upper()]
+        except (OSError, KeyError, ValueError):
+            raise NotImplementedError
+
+
+PROVIDER_CLASSES = {
+    "yfinance": YFinanceProvider,
+    "alpaca": AlpacaProvider,
+    "replay": ReplayProvider,
+}
+
+# Router operation -> hedge delay key
+OPERATION_KINDS = {
+    "get_bars": "bars",
+    "get_bars_multi": "bars",
+    "get_quote": "quote",
+    "get_fundamentals": "fundamentals",
+}
+
+
+class DataRouter:
+    """Route market data requests across providers by observed latency.
+
+    Providers are tried fastest-first (by an exponentially weighted latency
+    average); one that recently failed or whose circuit breaker is open goes
+    to the back of the line. If the first provider has not answered within
+    the operation's hedge delay, the next one is asked as well and the first
+    good answer wins. Errors fail over to the next provider straight away.
+    Provider calls run under the caller's deadline.
+    """
+
+    def __init__(self, providers):
+        self.providers = providers
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="market-data")
+        self._stats = {
+            p.name: {"latency": None, "calls": 0, "failures": 0, "hedged_wins": 0, "failed_at": 0}
+            for p in providers
+        }
+
+    def _ranked(self, hedge_delay):
+        now = time.time()
+        with self._lock:
+            def sort_key(indexed):
+                index, provider = indexed
+                stats = self._stats[provider.name]
+                cooling = now - stats["failed_at"] < PROVIDER_FAILURE_COOLDOWN or (
+                    provider.dependency is not None
+                    and get_dependency(provider.dependency).breaker.is_open()
+                )
+                # Until measured, assume a provider is as slow as the hedge delay
+                latency = stats["latency"] if stats["latency"] is not None else hedge_delay
+                return (cooling, latency, index)
+
+            return [p for _, p in sorted(enumerate(self.providers), key=sort_key)]
+
+    def _timed(self, provider, operation, args, kwargs):
+        started = time.monotonic()
+        method = getattr(provider, operation)
+        try:
+            if provider.dependency is None:
+                result = method(*args, **kwargs)
+            else:
+                result = get_dependency(provider.dependency).call(method, *args, **kwargs)
+        except (NotImplementedError, ResilienceError):
+            raise
+        except Exception:
+            with self._lock:
+                self._stats[provider.name]["failures"] += 1
+                self._stats[provider.name]["failed_at"] = time.time()
+            raise
+        elapsed = time.monotonic() - started
+        with self._lock:
+            stats = self._stats[provider.name]
+            stats["calls"] += 1
+            if stats["latency"] is None:
+                stats["latency"] = elapsed
+            else:
+                stats["latency"] += LATENCY_EWMA_ALPHA * (elapsed - stats["latency"])
+        return result
+
+    def call(self, operation, *args, **kwargs):
+        """Run an operation on the best provider, hedging and failing over as needed."""
+        hedge_delay = HEDGE_DELAYS[OPERATION_KINDS[operation]]
+        candidates = self._ranked(hedge_delay)
+        pending = {}
+        errors = []
+
+        def launch():
+            provider = candidates.pop(0)
+            future = submit(self._executor, self._timed, provider, operation, args, kwargs)
+            pending[future] = provider
+
+        launch()
+        while pending:
+            timeout, left = hedge_delay if candidates else None, remaining()
+            if left is not None:
+                timeout = max(0, left if timeout is None else min(timeout, left))
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                check_deadline(f"{operation} returned")
+                launch()  # Hedge: the current provider is slow
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except NotImplementedError:
+                    continue
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    errors.append((provider.name, e))
+                    continue
+                if pending:
+                    with self._lock:
+                        self._stats[provider.name]["hedged_wins"] += 1
+                return result
+            if candidates and not pending:
+                launch()  # Fail over
+
+        if not errors:
+            raise Exception(f"No market data provider supports {operation}")
+        message = "; ".join(f"{name}: {str(e)}" for name, e in errors)
+        if all(isinstance(e, ResilienceError) for _, e in errors):
+            raise CircuitOpenError("All market data providers are unavailable: " + message)
+        raise Exception("All market data providers failed: " + message)
+
+    def get_bars(self, ticker, period="1d", interval="1m"):
+        return self.call("get_bars", ticker, period, interval)
+
+    def get_bars_multi(self, tickers, period="3mo", interval="1d"):
+        return self.call("get_bars_multi", tickers, period, interval)
+
+    def get_quote(self, ticker):
+        return self.call("get_quote", ticker)
+
+    def get_fundamentals(self, ticker):
+        return self.call("get_fundamentals", ticker)
+
+    def get_stats(self):
+        """Per-provider latency and failure counters."""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def create_providers(names=MARKET_DATA_PROVIDERS):
+    """Instantiate the configured providers, skipping any that can't be set up."""
+    if REPLAY_DATA_DIR:
+        return [ReplayProvider()]
+    providers = []
+    for name in names:
+        try:
+            providers.append(PROVIDER_CLASSES[name.strip()]())
+        except Exception as e:
+            print(f"Market data provider '{name}' unavailable: {str(e)}")
+    return providers
+
+
+router = DataRouter(create_providers())
@@ -0,0 +1,121 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config.config import (
+    FUNDAMENTALS_TTL,
+    FUNDAMENTALS_CACHE_PATH,
+    FUNDAMENTALS_PREFETCH_WORKERS,
+)
+from singleflight import single_flight
+from data_providers import router
+
+# ticker -> {"fetched_at": float, "info": dict}
+_cache = {}
+_lock = threading.Lock()
+_loaded = False
+
+
+def _load_cache():
+    """Load persisted fundamentals from disk once per process."""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        _loaded = True
+        try:
+            with open(FUNDAMENTALS_CACHE_PATH) as f:
+                _cache.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+
+def save_cache():
+    """Persist the fundamentals cache to disk, merging entries saved by other workers."""
+    with _lock:
+        snapshot = dict(_cache)
+    try:
+        with open(FUNDAMENTALS_CACHE_PATH) as f:
+            on_disk = json.load(f)
+    except (OSError, ValueError):
+        on_disk = {}
+    for ticker, entry in on_disk.items():
+        if ticker not in snapshot or snapshot[ticker]["fetched_at"] < entry["fetched_at"]:
+            snapshot[ticker] = entry
+    directory = os.path.dirname(FUNDAMENTALS_CACHE_PATH)
+    tmp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # A temp file of our own: workers and threads save at the same time
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, FUNDAMENTALS_CACHE_PATH)
+    except OSError as e:
+        print(f"Error saving fundamentals cache: {str(e)}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _fetch_fundamentals(ticker):
+    """Fetch fundamentals for a ticker from the market data providers."""
+    return router.get_fundamentals(ticker)
+
+
+def _is_fresh(entry):
+    return entry is not None and time.time() - entry["fetched_at"] < FUNDAMENTALS_TTL
+
+
+@single_flight
+def _refresh_fundamentals(ticker):
+    """Fetch fundamentals and store them in the cache."""
+    info = _fetch_fundamentals(ticker)
+    with _lock:
+        _cache[ticker] = {"fetched_at": time.time(), "info": info}
+    return info
+
+
+def get_fundamentals(ticker, persist=True):
+    """Get cached fundamentals, sharing one fetch between concurrent callers."""
+    _load_cache()
+    ticker = ticker.upper()
+
+    with _lock:
+        entry = _cache.get(ticker)
+    if _is_fresh(entry):
+        return entry["info"]
+
+    try:
+        info = _refresh_fundamentals(ticker)
+    except Exception:
+        # Serve stale data rather than failing if we have any
+        if entry is not None:
+            return entry["info"]
+        raise
+
+    if persist:
+        save_cache()
+    return info
+
+
+def prefetch_fundamentals(tickers, max_workers=FUNDAMENTALS_PREFETCH_WORKERS):
+    """Warm the cache for a whole universe of tickers and persist it once."""
+    _load_cache()
+    with _lock:
+        stale = [t.upper() for t in tickers if not _is_fresh(_cache.get(t.upper()))]
+
+    failed = []
+
+    def fetch(ticker):
+        try:
+            get_fundamentals(ticker, persist=False)
+        except Exception:
+            failed.append(ticker)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(fetch, stale))
+
+    save_cache()
+    return {"fetched": len(stale) - len(failed), "failed": failed}
@@ -0,0 +1,251 @@
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from contextlib import closing
+from config.config import JOB_QUEUE_BACKEND, JOB_QUEUE_PATH, NUM_WORKERS
+
+# Job kinds that may have reached the broker before a crash; rerunning them
+# could place an order twice, so they are failed with this notice instead
+NOT_REQUEUED = {
+    "order": "⚠️ Order status unknown: the worker stopped while placing it. "
+             "Check `!position` before trying again.",
+    "strategy": "⚠️ Strategy cycle interrupted: the worker stopped mid-cycle and orders may "
+                "have been placed. Check `!account` before running it again.",
+}
+
+
+def shard_for(key, num_shards=NUM_WORKERS):
+    """Stable shard for a ticker (or other routing key) across processes."""
+    return zlib.crc32(str(key).upper().encode()) % num_shards
+
+
+class SQLiteJobQueue:
+    """Job queue shared between processes through a SQLite database.
+
+    Jobs are claimed per shard in (priority, id) order. Workers post any number
+    of result messages per job; the gateway delivers them to the job's channel.
+    Finished jobs are deleted, and results once the gateway acknowledges
+    them as sent, so the tables only hold live work (and failed jobs, for
+    inspection).
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    shard INTEGER NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    channel_id INTEGER,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (shard, status, priority, id);
+                CREATE INDEX IF NOT EXISTS jobs_depth ON jobs (status, priority);
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id INTEGER NOT NULL,
+                    channel_id INTEGER,
+                    content TEXT NOT NULL,
+                    delivered INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS results_pending ON results (delivered, id);
+                DELETE FROM jobs WHERE status = 'done';
+                DELETE FROM results WHERE delivered = 1;
+                """
+            )
+
+    def _connect(self):
+        # Autocommit mode; multi-statement operations use explicit transactions
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def enqueue(self, kind, payload, channel_id=None, shard=0, priority=0):
+        """Add a job and return its id."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (shard, priority, kind, payload, channel_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (shard, priority, kind, json.dumps(payload), channel_id, time.time()),
+            )
+            return cursor.lastrowid
+
+    def claim(self, shard, max_priority=None):
+        """Atomically take the next queued job for a shard, or None.
+
+        With max_priority set, only jobs at that priority or more urgent are taken.
+        """
+        if max_priority is None:
+            max_priority = sys.maxsize
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, kind, payload, channel_id FROM jobs "
+                "WHERE shard = ? AND status = 'queued' AND priority <= ? "
+                "ORDER BY priority, id LIMIT 1",
+                (shard, max_priority),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (row[0],))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "channel_id": row[3]}
+
+    def post_result(self, job, content):
+        """Queue a message for delivery to the job's channel."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO results (job_id, channel_id, content) VALUES (?, ?, ?)",
+                (job["id"], job["channel_id"], content),
+            )
+
+    def finish(self, job, status="done"):
+        """Delete a done job, or mark it failed."""
+        with closing(self._connect()) as conn:
+            if status == "done":
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+            else:
+                conn.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job["id"]))
+
+    def requeue_running(self, shard):
+        """Return jobs left running by a crashed worker to the queue.
+
+        Jobs in NOT_REQUEUED are failed instead, with a notice posted to
+        their channel.
+        """
+        kinds = list(NOT_REQUEUED)
+        placeholders = ", ".join("?" for _ in kinds)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, kind, channel_id FROM jobs WHERE shard = ? AND status = 'running' "
+                f"AND kind IN ({placeholders})",
+                [shard] + kinds,
+            ).fetchall()
+            conn.executemany(
+                "INSERT INTO results (job_id, channel_id, content) VALUES (?, ?, ?)",
+                [(job_id, channel_id, NOT_REQUEUED[kind]) for job_id, kind, channel_id in rows],
+            )
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed' WHERE id = ?", [(row[0],) for row in rows]
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE shard = ? AND status = 'running'",
+                (shard,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def pending_results(self, limit=100):
+        """Return undelivered results in order; they stay queued until acknowledged."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, job_id, channel_id, content FROM results "
+                "WHERE delivered = 0 ORDER BY id LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [{"id": r[0], "job_id": r[1], "channel_id": r[2], "content": r[3]} for r in rows]
+
+    def ack_results(self, result_ids):
+        """Delete results that have been sent."""
+        with closing(self._connect()) as conn:
+            conn.executemany("DELETE FROM results WHERE id = ?", [(i,) for i in result_ids])
+
+    def depth(self, shard=None, priority=None):
+        """Number of queued jobs, optionally for one shard and/or priority."""
+        query = "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+        params = []
+        if shard is not None:
+            query += " AND shard = ?"
+            params.append(shard)
+        if priority is not None:
+            query += " AND priority = ?"
+            params.append(priority)
+        with closing(self._connect()) as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+
+class MemoryJobQueue:
+    """In-process fallback with the same interface, for worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._shards = {}
+        self._result_ids = itertools.count(1)
+        self._results = []
+
+    def enqueue(self, kind, payload, channel_id=None, shard=0, priority=0):
+        job_id = next(self._ids)
+        job = {"id": job_id, "kind": kind, "payload": payload, "channel_id": channel_id}
+        with self._lock:
+            heapq.heappush(self._shards.setdefault(shard, []), (priority, job_id, job))
+        return job_id
+
+    def claim(self, shard, max_priority=None):
+        with self._lock:
+            jobs = self._shards.get(shard)
+            if not jobs or (max_priority is not None and jobs[0][0] > max_priority):
+                return None
+            return heapq.heappop(jobs)[2]
+
+    def post_result(self, job, content):
+        with self._lock:
+            self._results.append({
+                "id": next(self._result_ids),
+                "job_id": job["id"],
+                "channel_id": job["channel_id"],
+                "content": content,
+            })
+
+    def finish(self, job, status="done"):
+        pass
+
+    def requeue_running(self, shard):
+        pass
+
+    def pending_results(self, limit=100):
+        with self._lock:
+            return list(self._results[:limit])
+
+    def ack_results(self, result_ids):
+        result_ids = set(result_ids)
+        with self._lock:
+            self._results = [r for r in self._results if r["id"] not in result_ids]
+
+    def depth(self, shard=None, priority=None):
+        with self._lock:
+            shards = self._shards.values() if shard is None else [self._shards.get(shard, [])]
+            return sum(
+                1 for jobs in shards for job in jobs if priority is None or job[0] == priority
+            )
+
+
+def get_job_queue(backend=JOB_QUEUE_BACKEND):
+    """Create the configured job queue."""
+    if backend == "memory":
+        return MemoryJobQueue()
+    return SQLiteJobQueue()
@@ -1,22 +1,107 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from ta.momentum import RSIIndicator
 from ta.trend import MACD
 import sys
 import os
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config.config import RSI_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL
+from config.config import (
+    RSI_PERIOD,
+    MACD_FAST,
+    MACD_SLOW,
+    MACD_SIGNAL,
+    BAR_CACHE_TTL,
+    DEFAULT_PERIOD,
+    DEFAULT_TIMEFRAME,
+    WAREHOUSE_MAX_STALENESS,
+)
+from data_providers import router, ReplayProvider, period_to_days
+from market_snapshot import get_snapshot
+from warehouse import warehouse
+from fundamentals import get_fundamentals
+from singleflight import single_flight
+from resilience import ResilienceError
 
+# Cached daily closes: (tickers, period) -> (fetched_at, DataFrame)
+_daily_close_cache = {}
+
+def get_recorded_tickers():
+    """Tickers that have recorded daily bars in REPLAY_DATA_DIR."""
+    return ReplayProvider().get_tickers()
+
+def record_stock_data(tickers, directory, period="1y", interval="1d"):
+    """Save bars for later replay through REPLAY_DATA_DIR."""
+    replay = ReplayProvider(directory)
+    os.makedirs(directory, exist_ok=True)
+    for ticker in tickers:
+        router.get_bars(ticker, period, interval).to_csv(replay.path(ticker, interval))
+
+@single_flight
 def get_stock_data(ticker, period="1d", interval="1m"):
-    """Fetch stock data from Yahoo Finance."""
+    """Fetch stock data from the fastest available market data provider."""
     try:
-        stock = yf.Ticker(ticker)
-        df = stock.history(period=period, interval=interval)
-        return df
+        return router.get_bars(ticker, period, interval)
+    except ResilienceError:
+        raise  # Keep the type so callers can stop early
     except Exception as e:
         raise Exception(f"Error fetching data for {ticker}: {str(e)}")
 
+def get_daily_bars(ticker, period="5d"):
+    """Daily bars, read from the shared market snapshot when it has them."""
+    snapshot = get_snapshot()
+    days = period_to_days(period)
+    if snapshot is not None and days:
+        bars = snapshot.get_bars(ticker, days)
+        if bars is not None:
+            return bars
+    return get_stock_data(ticker, period=period, interval='1d')
+
+def _warehouse_window(period):
+    """(start, oldest acceptable last bar) for reading `period` from the warehouse."""
+    now = pd.Timestamp.now().normalize()
+    days = period_to_days(period)
+    start = now - pd.tseries.offsets.BDay(days) if days else None
+    return start, now - pd.Timedelta(days=WAREHOUSE_MAX_STALENESS)
+
+def get_history(ticker, period=DEFAULT_PERIOD, interval=DEFAULT_TIMEFRAME):
+    """Long-horizon bars from the local warehouse, or the providers if it is not up to date."""
+    start, fresh_after = _warehouse_window(period)
+    bars = warehouse.get_bars(ticker, interval, start=start)
+    if not bars.empty and bars.index[-1] >= fresh_after:
+        return bars
+    return get_stock_data(ticker, period=period, interval=interval)
+
+@single_flight
+def get_daily_closes(tickers, period="3mo"):
+    """Fetch daily closing prices for several tickers, cached for BAR_CACHE_TTL."""
+    key = (tuple(sorted(set(tickers))), period)
+    cached = _daily_close_cache.get(key)
+    if cached and time.time() - cached[0] < BAR_CACHE_TTL:
+        return cached[1]
+
+    # The warehouse covers the request if it has recent bars for every ticker
+    start, fresh_after = _warehouse_window(period)
+    closes = warehouse.get_closes(list(key[0]), start=start)
+    if (not closes.empty and set(key[0]) <= set(closes.columns)
+            and closes[list(key[0])].apply(pd.Series.last_valid_index).min() >= fresh_after):
+        closes = closes[list(key[0])]
+        _daily_close_cache[key] = (time.time(), closes)
+        return closes
+
+    try:
+        closes = router.get_bars_multi(list(key[0]), period, "1d")['Close']
+        if isinstance(closes, pd.Series):
+            closes = closes.to_frame(name=key[0][0])
+        closes = closes.reindex(columns=list(key[0]))
+    except ResilienceError:
+        raise
+    except Exception as e:
+        raise Exception(f"Error fetching daily bars: {str(e)}")
+
+    _daily_close_cache[key] = (time.time(), closes)
+    return closes
+
 def calculate_rsi(data):
     """Calculate RSI indicator."""
     rsi_indicator = RSIIndicator(close=data['Close'], window=RSI_PERIOD)
@@ -36,8 +121,8 @@ def calculate_macd(data):
         'histogram': macd.macd_diff().iloc[-1]
     }
 
-def get_technical_indicators(ticker):
-    """Get all technical indicators for a stock."""
+def compute_technical_indicators(ticker):
+    """Compute technical indicators from freshly fetched intraday bars."""
     data = get_stock_data(ticker)
     
     rsi = calculate_rsi(data)
@@ -54,19 +139,19 @@ def get_technical_indicators(ticker):
         'volume': data['Volume'].iloc[-1]
     }
 
+@single_flight
+def get_technical_indicators(ticker):
+    """Get all technical indicators for a stock, from the shared snapshot if it is fresh."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        indicators = snapshot.get_indicators(ticker)
+        if indicators is not None:
+            return indicators
+    return compute_technical_indicators(ticker)
+
 def get_stock_info(ticker):
-    """Get basic stock information."""
+    """Get basic stock information from the fundamentals cache."""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        return {
-            'name': info.get('longName', ticker),
-            'sector': info.get('sector', 'N/A'),
-            'industry': info.get('industry', 'N/A'),
-            'market_cap': info.get('marketCap', 'N/A'),
-            'pe_ratio': info.get('forwardPE', 'N/A'),
-            'dividend_yield': info.get('dividendYield', 'N/A')
-        }
+        return get_fundamentals(ticker)
     except Exception as e:
-        raise Exception(f"Error fetching info for {ticker}: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error fetching info for {ticker}: {str(e)}")
@@ -0,0 +1,250 @@
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import pandas as pd
+from config.config import (
+    SNAPSHOT_NAME,
+    SNAPSHOT_CAPACITY,
+    SNAPSHOT_DAYS,
+    SNAPSHOT_MAX_AGE,
+    SNAPSHOT_ATTACH_RETRY,
+)
+
+INDICATOR_FIELDS = ("price", "rsi", "macd", "macd_signal", "macd_hist", "volume")
+BAR_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# Header slots (int64)
+SEQUENCE, GENERATION, COUNT, CAPACITY, DAYS, UPDATED_AT = range(6)
+HEADER_SIZE = 8
+SYMBOL_WIDTH = 16
+MAX_READ_ATTEMPTS = 1000
+
+
+def _layout(capacity, days):
+    """(name, dtype, shape) of each array in the shared block, in order."""
+    return [
+        ("header", np.int64, (HEADER_SIZE,)),
+        ("symbols", f"S{SYMBOL_WIDTH}", (capacity,)),
+        ("indicators", np.float64, (capacity, len(INDICATOR_FIELDS))),
+        ("dates", np.int64, (capacity, days)),
+        ("bars", np.float64, (capacity, days, len(BAR_FIELDS))),
+    ]
+
+
+def _block_size(capacity, days):
+    return sum(
+        np.dtype(dtype).itemsize * int(np.prod(shape)) for _, dtype, shape in _layout(capacity, days)
+    )
+
+
+def _map_arrays(buffer, capacity, days):
+    """NumPy views over the shared block; nothing is copied."""
+    arrays, offset = {}, 0
+    for name, dtype, shape in _layout(capacity, days):
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += arrays[name].nbytes
+    return arrays
+
+
+def _open_shared_memory(name):
+    """Attach to an existing block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Otherwise the resource tracker unlinks the block when this reader exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class MarketSnapshot:
+    """Latest indicators and daily bars for a universe of symbols, in shared memory.
+
+    The block holds fixed-width arrays (symbols x fields) that every process
+    maps without copying. One writer publishes whole refreshes under a
+    seqlock: the sequence number is odd while a write is in progress, and a
+    reader retries if it changed while a row was being copied out.
+    """
+
+    def __init__(self, shm, capacity, days, owner=False):
+        self._shm = shm
+        self.capacity = capacity
+        self.days = days
+        self.owner = owner
+        self._arrays = _map_arrays(shm.buf, capacity, days)
+        self._generation = None
+        self._index = {}
+
+    @classmethod
+    def create(cls, name=SNAPSHOT_NAME, capacity=SNAPSHOT_CAPACITY, days=SNAPSHOT_DAYS):
+        """Create the block for a writer, replacing one left behind by a crashed writer."""
+        size = _block_size(capacity, days)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        snapshot = cls(shm, capacity, days, owner=True)
+        header = snapshot._arrays["header"]
+        header[:] = 0
+        header[CAPACITY], header[DAYS] = capacity, days
+        return snapshot
+
+    @classmethod
+    def attach(cls, name=SNAPSHOT_NAME):
+        """Map an existing block for reading. Raises FileNotFoundError if there is none."""
+        shm = _open_shared_memory(name)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        capacity, days = int(header[CAPACITY]), int(header[DAYS])
+        del header
+        if not capacity or shm.size < _block_size(capacity, days):
+            shm.close()
+            raise FileNotFoundError(f"Market snapshot '{name}' is not initialised")
+        return cls(shm, capacity, days)
+
+    def close(self):
+        self._arrays = None
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    def write(self, rows):
+        """Publish a refresh: {ticker: (indicators dict or None, bars DataFrame or None)}.
+
+        Missing data is stored as NaN, so readers fall back to the network
+        for those symbols rather than use an old value.
+        """
+        tickers = [ticker.upper() for ticker in rows][: self.capacity]
+        count = len(tickers)
+        symbols = np.array(tickers, dtype=f"S{SYMBOL_WIDTH}")
+        indicators = np.full((count, len(INDICATOR_FIELDS)), np.nan)
+        dates = np.zeros((count, self.days), dtype=np.int64)
+        bars = np.full((count, self.days, len(BAR_FIELDS)), np.nan)
+        for i, (indicator_values, history) in enumerate(list(rows.values())[:count]):
+            if indicator_values:
+                indicators[i] = [indicator_values[field] for field in INDICATOR_FIELDS]
+            if history is not None and not history.empty:
+                recent = history.tail(self.days)
+                index = recent.index.tz_localize(None) if recent.index.tz else recent.index
+                dates[i, -len(recent):] = index.values.astype("datetime64[ns]").astype(np.int64)
+                bars[i, -len(recent):] = recent[list(BAR_FIELDS)].to_numpy(dtype=np.float64)
+
+        # Everything above was prepared outside the critical section
+        arrays = self._arrays
+        header = arrays["header"]
+        header[SEQUENCE] += 1  # Odd: write in progress
+        try:
+            if header[COUNT] != count or (arrays["symbols"][:count] != symbols).any():
+                arrays["symbols"][:count] = symbols
+                arrays["symbols"][count:] = b""
+                header[COUNT] = count
+                header[GENERATION] += 1
+            arrays["indicators"][:count] = indicators
+            arrays["dates"][:count] = dates
+            arrays["bars"][:count] = bars
+            header[UPDATED_AT] = time.time_ns()
+        finally:
+            header[SEQUENCE] += 1
+
+    def _read(self, read):
+        """Run read(arrays) until it sees a consistent snapshot; None if it never does."""
+        header = self._arrays["header"]
+        for _ in range(MAX_READ_ATTEMPTS):
+            start = int(header[SEQUENCE])
+            if start % 2 == 0:
+                result = read(self._arrays)
+                if int(header[SEQUENCE]) == start:
+                    return result
+            time.sleep(0)
+        return None
+
+    def age(self):
+        """Seconds since the last refresh (infinite if never written)."""
+        updated_at = int(self._arrays["header"][UPDATED_AT])
+        return (time.time_ns() - updated_at) / 1e9 if updated_at else float("inf")
+
+    def _row(self, ticker):
+        """Row of a symbol, rebuilding the lookup table when the universe changes."""
+        if int(self._arrays["header"][GENERATION]) != self._generation:
+            result = self._read(
+                lambda arrays: (
+                    int(arrays["header"][GENERATION]),
+                    {
+                        symbol.decode(): row
+                        for row, symbol in enumerate(arrays["symbols"][: arrays["header"][COUNT]])
+                    },
+                )
+            )
+            if result is None:
+                return None
+            self._generation, self._index = result
+        return self._index.get(ticker.upper())
+
+    def _read_row(self, ticker, max_age, read):
+        row = self._row(ticker)
+        if row is None:
+            return None
+        symbol = ticker.upper().encode()
+
+        def read_checked(arrays):
+            # The universe may have changed since the lookup table was built
+            if arrays["symbols"][row] != symbol or self.age() > max_age:
+                return None
+            return read(arrays, row)
+
+        return self._read(read_checked)
+
+    def get_indicators(self, ticker, max_age=SNAPSHOT_MAX_AGE):
+        """Indicator dict for a symbol, or None if it is missing or stale."""
+        values = self._read_row(ticker, max_age, lambda arrays, row: arrays["indicators"][row].copy())
+        if values is None or np.isnan(values).any():
+            return None
+        return dict(zip(INDICATOR_FIELDS, values.tolist()))
+
+    def get_bars(self, ticker, days, max_age=SNAPSHOT_MAX_AGE):
+        """The last `days` daily bars for a symbol as a DataFrame, or None."""
+        if days > self.days:
+            return None
+        result = self._read_row(
+            ticker,
+            max_age,
+            lambda arrays, row: (arrays["dates"][row, -days:].copy(), arrays["bars"][row, -days:].copy()),
+        )
+        if result is None:
+            return None
+        dates, bars = result
+        present = ~np.isnan(bars[:, BAR_FIELDS.index("Close")])
+        if not present.any():
+            return None
+        return pd.DataFrame(
+            bars[present], index=pd.DatetimeIndex(dates[present]), columns=list(BAR_FIELDS)
+        )
+
+
+_reader = {"snapshot": None, "attempted_at": 0.0}
+_reader_lock = threading.Lock()
+
+
+def get_snapshot():
+    """The shared snapshot for reading, or None if no writer has published one.
+
+    Attaching is retried every SNAPSHOT_ATTACH_RETRY seconds, including when
+    the mapped snapshot has gone stale, in case the writer restarted with a
+    new block.
+    """
+    with _reader_lock:
+        snapshot = _reader["snapshot"]
+        if snapshot is not None and snapshot.age() <= SNAPSHOT_MAX_AGE:
+            return snapshot
+        if time.monotonic() - _reader["attempted_at"] < SNAPSHOT_ATTACH_RETRY:
+            return snapshot
+        _reader["attempted_at"] = time.monotonic()
+        try:
+            # The old mapping is left to the garbage collector; other threads may still read it
+            _reader["snapshot"] = MarketSnapshot.attach()
+        except (FileNotFoundError, ValueError):
+            pass
+        return _reader["snapshot"]
@@ -0,0 +1,80 @@
+from config.config import DISCORD_MESSAGE_LIMIT
+
+CODE_FENCE = "```"
+
+
+class MessageStream:
+    """Pack rows into chunks that each fit in a single Discord message.
+
+    Rows are buffered in a list and joined once per chunk, so building a long
+    report is linear in its size. In code-block mode every chunk is wrapped
+    in its own fence and repeats the table header.
+    """
+
+    def __init__(self, title="", header="", code_block=False, limit=DISCORD_MESSAGE_LIMIT):
+        self.title = title
+        self.header = header
+        self.code_block = code_block
+        self.limit = limit
+        self._parts = []
+        self._size = 0
+        self._first = True
+        self._reset()
+
+    def _overhead(self):
+        """Characters every chunk spends on its title, fences and header."""
+        size = len(self.title) if self._first else 0
+        if self.code_block:
+            size += len(CODE_FENCE) * 2 + 2 + len(self.header)
+        return size
+
+    def _reset(self):
+        self._parts = []
+        self._size = self._overhead()
+
+    def _render(self):
+        body = "".join(self._parts)
+        if self.code_block:
+            body = f"{CODE_FENCE}\n{self.header}{body}{CODE_FENCE}\n"
+        return (self.title if self._first else "") + body
+
+    def add(self, row):
+        """Add a row; returns a list of chunks that became full."""
+        chunks = []
+        for piece in self._split(row):
+            if self._parts and self._size + len(piece) > self.limit:
+                chunks.append(self.flush())
+            self._parts.append(piece)
+            self._size += len(piece)
+        return chunks
+
+    def _split(self, row):
+        """Break a row that could never fit into pieces that do."""
+        room = self.limit - self._overhead()
+        if len(row) <= room:
+            return [row]
+        return [row[i:i + room] for i in range(0, len(row), room)]
+
+    def flush(self):
+        """Return the buffered chunk (or None) and start a new one."""
+        if not self._parts and not self._first:
+            return None
+        chunk = self._render()
+        self._first = False
+        self._reset()
+        return chunk
+
+
+def stream_rows(rows, title="", header="", code_block=False, limit=DISCORD_MESSAGE_LIMIT):
+    """Yield message chunks as rows arrive."""
+    stream = MessageStream(title, header, code_block, limit)
+    for row in rows:
+        yield from stream.add(row)
+    chunk = stream.flush()
+    if chunk:
+        yield chunk
+
+
+def split_message(message, limit=DISCORD_MESSAGE_LIMIT):
+    """Split a finished message into chunks on line boundaries."""
+    return list(stream_rows(message.splitlines(keepends=True), limit=limit))
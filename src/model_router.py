@@ -0,0 +1,247 @@
+import json
+import re
+import threading
+import time
+from config.config import (
+    GOOGLE_API_KEY,
+    LLM_BACKEND,
+    MODEL_TIERS,
+    MODEL_COSTS,
+    MODEL_MIN_INTERVALS,
+    MODEL_REQUEST_TIMEOUT,
+    MODEL_COOLDOWN,
+    LATENCY_EWMA_ALPHA,
+)
+from resilience import get_dependency, is_rate_limit, CircuitOpenError, DeadlineExceeded
+
+DEFAULT_MIN_INTERVAL = 0.5
+
+
+class RateLimitError(Exception):
+    """Every model that could serve a request is rate limited."""
+
+    pass
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class LanguageModel:
+    """Interface for a chat model.
+
+    invoke returns (text, input_tokens, output_tokens). With json_mode the
+    model is asked to reply with a JSON object.
+    """
+
+    name = "base"
+
+    def available(self):
+        """False while the model's circuit breaker is open."""
+        return True
+
+    def invoke(self, prompt, json_mode=False, temperature=0.7):
+        raise NotImplementedError
+
+
+class GeminiModel(LanguageModel):
+    """A Gemini model through LangChain, behind its own circuit breaker."""
+
+    def __init__(self, name):
+        import google.generativeai as genai
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        genai.configure(api_key=GOOGLE_API_KEY)
+        self.name = name
+        self._chat_class = ChatGoogleGenerativeAI
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._dependency = get_dependency(f"gemini:{name}", "gemini")
+
+    def available(self):
+        return not self._dependency.breaker.is_open()
+
+    def _client(self, json_mode, temperature):
+        key = (json_mode, temperature)
+        with self._lock:
+            if key not in self._clients:
+                options = {"response_mime_type": "application/json"} if json_mode else {}
+                self._clients[key] = self._chat_class(
+                    model=self.name,
+                    temperature=temperature,
+                    convert_system_message_to_human=True,
+                    max_retries=1,  # Retries follow the "gemini" resilience policy
+                    request_timeout=MODEL_REQUEST_TIMEOUT,
+                    **options,
+                )
+            return self._clients[key]
+
+    def invoke(self, prompt, json_mode=False, temperature=0.7):
+        response = self._dependency.call(self._client(json_mode, temperature).invoke, prompt)
+        text = response.content
+        usage = getattr(response, "usage_metadata", None) or {}
+        return (
+            text,
+            usage.get("input_tokens") or estimate_tokens(prompt),
+            usage.get("output_tokens") or estimate_tokens(text),
+        )
+
+
+class StubModel(LanguageModel):
+    """Deterministic offline model for tests and replay runs.
+
+    Sentiment prompts get a neutral reply; JSON (decision) prompts get a
+    Buy/Sell/Hold derived from the RSI in the prompt.
+    """
+
+    name = "stub"
+
+    def invoke(self, prompt, json_mode=False, temperature=0.7):
+        if json_mode:
+            match = re.search(r"RSI:\s*([\d.]+)", prompt)
+            rsi = float(match.group(1)) if match else 50.0
+            action = "buy" if rsi < 40 else "sell" if rsi > 60 else "hold"
+            text = json.dumps(
+                {"action": action, "confidence": 65, "reason": f"Stub model reading RSI {rsi:.1f}"}
+            )
+        else:
+            text = "Sentiment: neu - Stub model, no live news analysis"
+        return text, estimate_tokens(prompt), estimate_tokens(text)
+
+
+class ModelRouter:
+    """Send each prompt to the first available model of its tier.
+
+    Tiers list models in preference order (MODEL_TIERS). A model that
+    answers with a rate limit error is skipped for a cooldown that doubles
+    with each consecutive 429, and the next model is tried straight away,
+    so a caller never sleeps waiting for quota. Other errors also fall
+    through to the next model, and a model whose circuit breaker is open
+    is skipped without being called. Latency, tokens and cost are tracked per
+    model.
+    """
+
+    def __init__(self, models, tiers):
+        self.models = {model.name: model for model in models}
+        self.tiers = {
+            tier: [name for name in names if name in self.models] for tier, names in tiers.items()
+        }
+        self._lock = threading.Lock()
+        self._cooldowns = {name: (0.0, 0) for name in self.models}  # until, consecutive 429s
+        self._next_slot = {name: 0.0 for name in self.models}
+        self._stats = {
+            name: {
+                "calls": 0,
+                "failures": 0,
+                "rate_limited": 0,
+                "fallbacks": 0,
+                "latency": None,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cost": 0.0,
+            }
+            for name in self.models
+        }
+
+    def _available(self, tier):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                name for name in self.tiers[tier]
+                if self._cooldowns[name][0] <= now and self.models[name].available()
+            ]
+
+    def _pace(self, name):
+        """Space calls to one model by its minimum interval."""
+        interval = MODEL_MIN_INTERVALS.get(name, DEFAULT_MIN_INTERVAL)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot[name])
+            self._next_slot[name] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _record_success(self, name, elapsed, input_tokens, output_tokens):
+        input_cost, output_cost = MODEL_COSTS.get(name, (0.0, 0.0))
+        with self._lock:
+            self._cooldowns[name] = (0.0, 0)
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost"] += (input_tokens * input_cost + output_tokens * output_cost) / 1e6
+            if stats["latency"] is None:
+                stats["latency"] = elapsed
+            else:
+                stats["latency"] += LATENCY_EWMA_ALPHA * (elapsed - stats["latency"])
+
+    def _record_failure(self, name, error):
+        with self._lock:
+            stats = self._stats[name]
+            stats["failures"] += 1
+            if is_rate_limit(error):
+                stats["rate_limited"] += 1
+                _, strikes = self._cooldowns[name]
+                base, cap = MODEL_COOLDOWN
+                delay = min(base * 2 ** strikes, cap)
+                self._cooldowns[name] = (time.monotonic() + delay, strikes + 1)
+
+    def invoke(self, tier, prompt, json_mode=False, temperature=0.7):
+        """Return the reply text from the best available model for a tier."""
+        if not self.tiers.get(tier):
+            raise Exception(f"No models configured for the '{tier}' tier")
+        available = self._available(tier)
+        with self._lock:
+            cooling = any(self._cooldowns[name][0] > time.monotonic() for name in self.tiers[tier])
+        if not available and not cooling:
+            raise CircuitOpenError(f"All '{tier}' AI models are unavailable; try again shortly")
+        errors = []
+        for position, name in enumerate(available):
+            self._pace(name)
+            started = time.monotonic()
+            try:
+                text, input_tokens, output_tokens = self.models[name].invoke(
+                    prompt, json_mode, temperature
+                )
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                self._record_failure(name, e)
+                errors.append((name, e))
+                continue
+            self._record_success(name, time.monotonic() - started, input_tokens, output_tokens)
+            if position:
+                with self._lock:
+                    self._stats[name]["fallbacks"] += 1
+            return text
+
+        if all(is_rate_limit(error) for _, error in errors):
+            with self._lock:
+                retry_in = min(self._cooldowns[name][0] for name in self.tiers[tier])
+            wait = max(0, int(retry_in - time.monotonic()) + 1)
+            raise RateLimitError(f"AI models are rate limited; try again in {wait} seconds")
+        raise Exception(
+            "All AI models failed: " + "; ".join(f"{name}: {str(e)}" for name, e in errors)
+        )
+
+    def get_stats(self):
+        """Per-model call, latency, token and cost counters."""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def create_router(backend=LLM_BACKEND):
+    """Build a router over the configured models, or the stub model offline."""
+    if backend == "stub":
+        return ModelRouter([StubModel()], {tier: ["stub"] for tier in MODEL_TIERS})
+    models = []
+    for name in dict.fromkeys(name for names in MODEL_TIERS.values() for name in names):
+        try:
+            models.append(GeminiModel(name))
+        except Exception as e:
+            print(f"AI model '{name}' unavailable: {str(e)}")
+    return ModelRouter(models, MODEL_TIERS)
+
+
+router = create_router()
@@ -0,0 +1,142 @@
+import numpy as np
+from fundamentals import prefetch_fundamentals
+from market_data import get_daily_closes, get_stock_info
+from config.config import MAX_POSITION_SIZE, VOLATILITY_WINDOW, VAR_CONFIDENCE, VAR_WINDOW
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def positions_to_arrays(positions):
+    """Convert Alpaca position objects into column arrays."""
+    return {
+        "symbols": np.array([p.symbol for p in positions], dtype=object),
+        "qty": np.array([p.qty for p in positions], dtype=float),
+        "avg_entry_price": np.array([p.avg_entry_price for p in positions], dtype=float),
+        "current_price": np.array([p.current_price for p in positions], dtype=float),
+        "market_value": np.array([p.market_value for p in positions], dtype=float),
+    }
+
+
+def get_sectors(symbols):
+    """Look up the sector of each symbol, falling back to 'N/A'."""
+    # Fetch every uncached symbol concurrently, then read them from the cache
+    failed = set(prefetch_fundamentals(list(symbols))["failed"])
+    sectors = []
+    for symbol in symbols:
+        if symbol.upper() in failed:
+            sectors.append("N/A")
+            continue
+        try:
+            sectors.append(get_stock_info(symbol)["sector"] or "N/A")
+        except Exception:
+            sectors.append("N/A")
+    return np.array(sectors, dtype=object)
+
+
+def get_portfolio_analytics(positions, portfolio_value, sectors=None):
+    """Compute P&L, concentration, sector exposure and risk for all positions."""
+    if not positions:
+        return None
+
+    arrays = positions_to_arrays(positions)
+    symbols = arrays["symbols"]
+    qty = arrays["qty"]
+    market_value = arrays["market_value"]
+
+    # Unrealized P&L per position and in total
+    cost_basis = qty * arrays["avg_entry_price"]
+    unrealized_pl = qty * (arrays["current_price"] - arrays["avg_entry_price"])
+    unrealized_pl_pct = np.divide(
+        unrealized_pl,
+        np.abs(cost_basis),
+        out=np.zeros_like(unrealized_pl),
+        where=cost_basis != 0,
+    ) * 100
+
+    # Concentration against the per-position limit
+    weights = market_value / portfolio_value if portfolio_value else np.zeros_like(market_value)
+    concentration = np.abs(weights) / MAX_POSITION_SIZE
+
+    # Exposure by sector
+    if sectors is None:
+        sectors = get_sectors(symbols)
+    sector_names, sector_idx = np.unique(np.asarray(sectors, dtype=str), return_inverse=True)
+    sector_exposure = np.bincount(sector_idx, weights=market_value, minlength=len(sector_names))
+
+    # Rolling volatility over VOLATILITY_WINDOW and historical VaR over VAR_WINDOW, from cached daily bars
+    closes = get_daily_closes(list(symbols)).reindex(columns=list(symbols)).to_numpy(dtype=float)
+    returns = np.diff(closes, axis=0) / closes[:-1]
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+    window = returns[-VOLATILITY_WINDOW:]
+    if len(window) > 1:
+        position_volatility = window.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    else:
+        position_volatility = np.zeros(len(symbols))
+
+    daily_pnl = returns @ market_value
+    window_pnl = daily_pnl[-VOLATILITY_WINDOW:]
+    if len(window_pnl) > 1 and portfolio_value:
+        portfolio_volatility = window_pnl.std(ddof=1) / portfolio_value * np.sqrt(TRADING_DAYS_PER_YEAR)
+    else:
+        portfolio_volatility = 0.0
+    var_pnl = daily_pnl[-VAR_WINDOW:]
+    value_at_risk = max(-np.quantile(var_pnl, 1 - VAR_CONFIDENCE), 0.0) if len(var_pnl) else 0.0
+
+    order = np.argsort(-np.abs(market_value))
+    return {
+        "positions": [
+            {
+                "symbol": symbols[i],
+                "quantity": qty[i],
+                "market_value": market_value[i],
+                "weight": weights[i] * 100,
+                "concentration": concentration[i],
+                "unrealized_pl": unrealized_pl[i],
+                "unrealized_pl_pct": unrealized_pl_pct[i],
+                "volatility": position_volatility[i] * 100,
+            }
+            for i in order
+        ],
+        "sector_exposure": {
+            name: value for name, value in sorted(zip(sector_names, sector_exposure), key=lambda x: -abs(x[1]))
+        },
+        "total_market_value": float(market_value.sum()),
+        "total_unrealized_pl": float(unrealized_pl.sum()),
+        "gross_exposure": float(np.abs(market_value).sum() / portfolio_value * 100) if portfolio_value else 0.0,
+        "over_limit": list(symbols[concentration > 1]),
+        "portfolio_volatility": float(portfolio_volatility) * 100,
+        "value_at_risk": float(value_at_risk),
+    }
+
+
+def format_portfolio_analytics(analytics, limit=10):
+    """Format portfolio analytics for Discord."""
+    if not analytics:
+        return "📭 No open positions."
+
+    message = (
+        f"📈 **Portfolio Analytics**\n"
+        f"   • Market Value: ${analytics['total_market_value']:,.2f}\n"
+        f"   • Unrealized P/L: ${analytics['total_unrealized_pl']:,.2f}\n"
+        f"   • Gross Exposure: {analytics['gross_exposure']:.1f}%\n"
+        f"   • Volatility ({VOLATILITY_WINDOW}d, ann.): {analytics['portfolio_volatility']:.1f}%\n"
+        f"   • 1-Day VaR ({VAR_CONFIDENCE:.0%}, {VAR_WINDOW}d): ${analytics['value_at_risk']:,.2f}\n\n"
+    )
+
+    message += "🏢 **Sector Exposure**\n"
+    for sector, value in analytics["sector_exposure"].items():
+        message += f"   • {sector}: ${value:,.2f}\n"
+
+    message += "\n📊 **Positions**\n"
+    for position in analytics["positions"][:limit]:
+        flag = " ⚠️" if position["concentration"] > 1 else ""
+        message += (
+            f"   • {position['symbol']}: {position['weight']:.1f}% of portfolio{flag} | "
+            f"P/L ${position['unrealized_pl']:,.2f} ({position['unrealized_pl_pct']:.2f}%) | "
+            f"Vol {position['volatility']:.1f}%\n"
+        )
+
+    if analytics["over_limit"]:
+        message += f"\n⚠️ Above max position size ({MAX_POSITION_SIZE:.0%}): {', '.join(analytics['over_limit'])}\n"
+
+    return message
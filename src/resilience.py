@@ -0,0 +1,397 @@
+import asyncio
+import contextvars
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps, partial
+from inspect import iscoroutinefunction
+from config.config import RESILIENCE_POLICIES
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+# Exception classes (anywhere in the MRO) and HTTP statuses worth retrying
+TRANSIENT_ERROR_NAMES = {
+    "ConnectionError", "TimeoutError", "Timeout", "ReadTimeout", "ConnectTimeout",
+    "ServiceUnavailable", "InternalServerError", "ResourceExhausted", "TooManyRequests",
+    "YFRateLimitError",
+}
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+# Only for errors without a status attribute. Status codes count only where
+# they read as one (leading, or after "HTTP Error"/"status"), so that text
+# such as "S&P 500" does not match.
+STATUS_IN_MESSAGE = r"(?:^|\b(?:HTTP Error|status(?: code)?):? ?)"
+TRANSIENT_MESSAGE = re.compile(
+    STATUS_IN_MESSAGE + r"(?:429|50[0234])\b|rate limit|too many requests|resource has been exhausted"
+    r"|internal server error|service unavailable|bad gateway|gateway time-?out"
+    r"|timed out|temporarily unavailable|connection (reset|refused|aborted)",
+    re.IGNORECASE,
+)
+RATE_LIMIT_MESSAGE = re.compile(
+    STATUS_IN_MESSAGE + r"429\b|rate limit|too many requests|resource has been exhausted",
+    re.IGNORECASE,
+)
+
+
+def _status(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+class ResilienceError(Exception):
+    """A call was refused before reaching its dependency; callers should give up, not retry."""
+
+    pass
+
+
+class CircuitOpenError(ResilienceError):
+    """The dependency's circuit breaker is open."""
+
+    pass
+
+
+class DeadlineExceeded(ResilienceError):
+    """The caller's deadline has passed."""
+
+    pass
+
+
+def is_transient(error):
+    """True for errors a later attempt may not hit: timeouts, dropped connections, 429s and 5xx."""
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    status = _status(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return bool(TRANSIENT_MESSAGE.search(str(error)))
+
+
+def is_rate_limit(error):
+    """True if an error is a quota / 429 response."""
+    status = _status(error)
+    if status is not None:
+        return status == 429
+    return bool(RATE_LIMIT_MESSAGE.search(str(error)))
+
+
+# Deadlines
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Bound the calls made inside this block to `seconds` from now.
+
+    Nested deadlines keep the earliest. The deadline follows the context
+    into coroutines and into threads started with submit(). None means no
+    limit.
+    """
+    if seconds is None:
+        yield
+        return
+    current = _deadline.get()
+    at = time.monotonic() + seconds
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left before the current deadline, or None if there is none."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def check_deadline(action="continuing"):
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {action}")
+
+
+def submit(executor, fn, *args, **kwargs):
+    """executor.submit, carrying the caller's deadline into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class CircuitBreaker:
+    """Stop calling a dependency after consecutive failures.
+
+    Closed: calls go through. After `failure_threshold` failed calls in a
+    row (each counted once, after its retries) the breaker opens and calls
+    fail at once with CircuitOpenError.
+    Once `reset_timeout` seconds have passed, one probe call is let through
+    (half-open); its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opens = 0
+        self.rejected = 0
+
+    def is_open(self):
+        """True while calls are being refused (open and not yet due for a probe)."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        """Admit a call, or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self.probing):
+                self.probing = self.state == HALF_OPEN
+                return
+            self.rejected += 1
+            retry_in = max(0, int(self.opened_at + self.reset_timeout - time.monotonic()) + 1)
+        raise CircuitOpenError(f"{self.name} is unavailable; retrying in about {retry_in} seconds")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opens += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release(self):
+        """Forget an admitted call that never reached the dependency."""
+        with self._lock:
+            self.probing = False
+
+
+class RetryBudget:
+    """Cap retries at a fraction of calls, so retries cannot multiply load on a struggling upstream.
+
+    Each call earns `ratio` of a retry, banked up to `burst`; each retry
+    spends one.
+    """
+
+    def __init__(self, ratio, burst):
+        self.ratio = ratio
+        self.burst = burst
+        self._lock = threading.Lock()
+        self.tokens = float(burst)
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Dependency:
+    """Retries with backoff, a circuit breaker and a retry budget for one external service.
+
+    call() retries transient failures with exponential backoff and full
+    jitter while attempts, the retry budget and the caller's deadline allow;
+    other errors are raised straight away and do not count against the
+    breaker. A retry that would sleep past the deadline is not made. From
+    inside a running event loop the synchronous call() never sleeps; use
+    call_async() there.
+    """
+
+    def __init__(self, name, attempts, backoff, failure_threshold, reset_timeout,
+                 retry_ratio, retry_burst, retry_rate_limits=True):
+        self.name = name
+        self.attempts = attempts
+        self.backoff = backoff
+        self.retry_rate_limits = retry_rate_limits
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.budget = RetryBudget(retry_ratio, retry_burst)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "retries": 0, "budget_exhausted": 0}
+
+    def _count(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    def _admit(self, attempt):
+        """Check the deadline and breaker once per call; its retries are already admitted."""
+        if attempt == 0:
+            check_deadline(f"calling {self.name}")
+            self.breaker.allow()
+            self._count("calls")
+            self.budget.deposit()
+
+    def _retry_delay(self, attempt, error, retry):
+        """Seconds to wait before the next attempt, or None to give up and raise."""
+        if isinstance(error, (ResilienceError, NotImplementedError)):
+            # Refused before reaching this dependency (a nested call, or an unsupported operation)
+            self.breaker.release()
+            return None
+        if not is_transient(error):
+            self.breaker.record_success()  # The service answered
+            return None
+        self._count("failures")
+        delay = self._backoff(attempt, error, retry)
+        if delay is None:
+            # The call has failed for good: one breaker failure, however many attempts it took
+            self.breaker.record_failure()
+        return delay
+
+    def _backoff(self, attempt, error, retry):
+        if not retry or attempt + 1 >= self.attempts:
+            return None
+        if is_rate_limit(error) and not self.retry_rate_limits:
+            return None
+        base, cap = self.backoff
+        delay = random.uniform(0, min(cap, base * 2 ** attempt))
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        if not self.budget.withdraw():
+            self._count("budget_exhausted")
+            return None
+        self._count("retries")
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs), retrying transient failures."""
+        return self._call(True, fn, args, kwargs)
+
+    def call_once(self, fn, *args, **kwargs):
+        """Call fn through the breaker without retrying, for operations that are not idempotent."""
+        return self._call(False, fn, args, kwargs)
+
+    def _call(self, retry, fn, args, kwargs):
+        retry = retry and not _in_event_loop()
+        attempt = 0
+        while True:
+            self._admit(attempt)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, retry)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs), backing off with asyncio.sleep between attempts."""
+        attempt = 0
+        while True:
+            self._admit(attempt)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, True)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(state=self.breaker.state, opens=self.breaker.opens, rejected=self.breaker.rejected)
+        return stats
+
+
+class GuardedClient:
+    """Proxy that sends every method call on an API client through a Dependency.
+
+    Methods named in `once` (order placement and the like) go through the
+    breaker but are never retried.
+    """
+
+    def __init__(self, client, dependency, once=()):
+        self._client = client
+        self._dependency = dependency
+        self._once = set(once)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        if name in self._once:
+            return partial(self._dependency.call_once, attr)
+        return partial(self._dependency.call, attr)
+
+
+_dependencies = {}
+_registry_lock = threading.Lock()
+
+
+def get_dependency(name, policy=None):
+    """The shared Dependency called `name`, configured by RESILIENCE_POLICIES[policy or name].
+
+    Distinct names get their own breaker and budget, e.g. one per model.
+    """
+    with _registry_lock:
+        if name not in _dependencies:
+            _dependencies[name] = Dependency(name, **RESILIENCE_POLICIES[policy or name])
+        return _dependencies[name]
+
+
+def resilient(name, retry=True):
+    """Decorator that runs a function (or coroutine function) through a dependency's policy."""
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await get_dependency(name).call_async(func, *args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            dependency = get_dependency(name)
+            call = dependency.call if retry else dependency.call_once
+            return call(func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def guard(client, name, once=()):
+    """Wrap an API client so each method call goes through a dependency's policy."""
+    return GuardedClient(client, get_dependency(name), once)
+
+
+def get_stats():
+    """Breaker state and retry counters for every dependency used in this process."""
+    with _registry_lock:
+        dependencies = list(_dependencies.values())
+    return {dependency.name: dependency.get_stats() for dependency in dependencies}
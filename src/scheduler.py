@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from config.config import (
+    JOB_PRIORITIES,
+    PRIORITY_CLASSES,
+    USER_QUOTAS,
+    GUILD_QUOTAS,
+    MAX_QUEUE_DEPTH,
+    SCHEDULER_MAX_TRACKED_KEYS,
+)
+
+
+class TokenBucket:
+    """Allow `capacity` requests at once, refilled at capacity/period per second."""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def retry_after(self, now=None):
+        """Seconds until one token is available (0 if available now)."""
+        self._refill(now or time.monotonic())
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class BucketStore:
+    """Token buckets keyed by (class, id), with LRU eviction to bound memory.
+
+    Evicting a bucket forgets its history, which at worst gives that key a
+    fresh allowance; the least recently used keys are the safest to drop.
+    """
+
+    def __init__(self, quotas, max_keys=SCHEDULER_MAX_TRACKED_KEYS):
+        self.quotas = quotas
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def get(self, priority_class, key):
+        bucket_key = (priority_class, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = TokenBucket(*self.quotas[priority_class])
+            self._buckets[bucket_key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(bucket_key)
+        return bucket
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Scheduler:
+    """Admission control in front of the job queue.
+
+    Each job kind belongs to a priority class (orders > analysis > scans;
+    stats jobs have a class of their own).
+    A job is admitted only if the user's and guild's token buckets for that
+    class have capacity and the class's queue is below its depth limit, so
+    under load scans are shed first while orders keep flowing.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._lock = threading.Lock()
+        self._user_buckets = BucketStore(USER_QUOTAS)
+        self._guild_buckets = BucketStore(GUILD_QUOTAS)
+        self._stats = {
+            name: {"admitted": 0, "throttled": 0, "shed": 0} for name in MAX_QUEUE_DEPTH
+        }
+
+    def admit(self, kind, user_id, guild_id=None):
+        """Check quotas and queue depth; returns (priority, None) or (None, reason)."""
+        priority = JOB_PRIORITIES[kind]
+        priority_class = PRIORITY_CLASSES[priority]
+
+        # Load shedding: refuse work for a class whose queue is already full
+        if self.queue.depth(priority=priority) >= MAX_QUEUE_DEPTH[priority_class]:
+            with self._lock:
+                self._stats[priority_class]["shed"] += 1
+            return None, "🚦 The bot is busy right now. Please try again in a minute."
+
+        with self._lock:
+            now = time.monotonic()
+            buckets = [self._user_buckets.get(priority_class, user_id)]
+            if guild_id is not None:
+                buckets.append(self._guild_buckets.get(priority_class, guild_id))
+            wait = max(bucket.retry_after(now) for bucket in buckets)
+            if wait > 0:
+                self._stats[priority_class]["throttled"] += 1
+                scope = "this server" if wait > buckets[0].retry_after(now) else "you"
+                return None, (
+                    f"⏳ Too many {priority_class} requests from {scope}. "
+                    f"Please wait {int(wait) + 1} seconds."
+                )
+            for bucket in buckets:
+                bucket.take()
+            self._stats[priority_class]["admitted"] += 1
+        return priority, None
+
+    def get_stats(self):
+        """Admission counters per class, plus queue depth and tracked keys."""
+        with self._lock:
+            stats = {name: dict(counts) for name, counts in self._stats.items()}
+            tracked = len(self._user_buckets) + len(self._guild_buckets)
+        for priority, name in PRIORITY_CLASSES.items():
+            stats[name]["queued"] = self.queue.depth(priority=priority)
+        return {"classes": stats, "tracked_keys": tracked}
@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from types import SimpleNamespace
+from market_data import get_stock_data
+from config.config import SIM_STARTING_CASH, SIM_BROKER_PATH
+
+SIM_SPREAD = 0.0005  # Half-spread applied around the last close for quotes
+
+ORDER_FIELDS = ("id", "symbol", "qty", "side", "type", "status", "filled_qty", "filled_avg_price")
+
+
+class SimulatedBroker:
+    """Local stand-in for the subset of the Alpaca REST API the bot uses.
+
+    Prices come from get_stock_data, so with REPLAY_DATA_DIR set the broker
+    trades entirely against recorded bars. Marketable orders fill immediately.
+    Returned objects mirror Alpaca's, including string-typed numeric fields.
+    Cash, positions and orders live in a SQLite database, so the gateway and
+    every worker process trade against the same account.
+    """
+
+    def __init__(self, path=SIM_BROKER_PATH, starting_cash=SIM_STARTING_CASH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS account (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    cash REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS positions (
+                    symbol TEXT PRIMARY KEY,
+                    qty INTEGER NOT NULL,
+                    avg_entry_price REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS orders (
+                    id TEXT PRIMARY KEY,
+                    symbol TEXT NOT NULL,
+                    qty INTEGER NOT NULL,
+                    side TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    filled_qty INTEGER NOT NULL DEFAULT 0,
+                    filled_avg_price REAL
+                );
+                """
+            )
+            conn.execute("INSERT OR IGNORE INTO account (id, cash) VALUES (0, ?)", (float(starting_cash),))
+
+    def _connect(self):
+        # Autocommit mode; fills use explicit transactions
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _state(self):
+        """(cash, {symbol: {"qty", "avg_entry_price"}}) as of one read."""
+        with closing(self._connect()) as conn:
+            cash = conn.execute("SELECT cash FROM account").fetchone()[0]
+            rows = conn.execute("SELECT symbol, qty, avg_entry_price FROM positions").fetchall()
+        return cash, {s: {"qty": q, "avg_entry_price": p} for s, q, p in rows}
+
+    def _last_price(self, symbol):
+        data = get_stock_data(symbol, period="5d", interval="1d")
+        if data.empty:
+            raise Exception(f"No price data for {symbol}")
+        return float(data["Close"].iloc[-1])
+
+    def _position_obj(self, symbol, position):
+        price = self._last_price(symbol)
+        qty = position["qty"]
+        return SimpleNamespace(
+            symbol=symbol,
+            qty=str(qty),
+            avg_entry_price=str(position["avg_entry_price"]),
+            current_price=str(price),
+            market_value=str(qty * price),
+            cost_basis=str(qty * position["avg_entry_price"]),
+            unrealized_pl=str(qty * (price - position["avg_entry_price"])),
+        )
+
+    @staticmethod
+    def _order_obj(row):
+        order = dict(zip(ORDER_FIELDS, row))
+        filled_price = order["filled_avg_price"]
+        return SimpleNamespace(
+            id=order["id"],
+            symbol=order["symbol"],
+            qty=str(order["qty"]),
+            side=order["side"],
+            type=order["type"],
+            status=order["status"],
+            filled_qty=str(order["filled_qty"]),
+            filled_avg_price=None if filled_price is None else str(filled_price),
+            failed_at=None,
+        )
+
+    def get_account(self):
+        cash, positions = self._state()
+        equity = cash + sum(p["qty"] * self._last_price(s) for s, p in positions.items())
+        return SimpleNamespace(
+            cash=str(cash),
+            buying_power=str(cash),
+            portfolio_value=str(equity),
+            equity=str(equity),
+            daytrade_count="0",
+        )
+
+    def get_position(self, symbol):
+        position = self._state()[1].get(symbol)
+        if position is None:
+            raise Exception("no position available")
+        return self._position_obj(symbol, position)
+
+    def list_positions(self):
+        return [self._position_obj(s, p) for s, p in self._state()[1].items()]
+
+    def get_latest_quote(self, symbol):
+        price = self._last_price(symbol)
+        return SimpleNamespace(
+            ask_price=round(price * (1 + SIM_SPREAD), 2),
+            bid_price=round(price * (1 - SIM_SPREAD), 2),
+        )
+
+    def get_clock(self):
+        return SimpleNamespace(is_open=True, timestamp=time.time())
+
+    def submit_order(self, symbol, qty, side, type="market", time_in_force="day",
+                     limit_price=None, extended_hours=False):
+        qty = int(qty)
+        quote = self.get_latest_quote(symbol)
+        price = quote.ask_price if side == "buy" else quote.bid_price
+        marketable = (
+            limit_price is None
+            or (side == "buy" and limit_price >= price)
+            or (side == "sell" and limit_price <= price)
+        )
+        order_id = str(uuid.uuid4())
+
+        conn = self._connect()
+        try:
+            # One write transaction, so concurrent processes cannot overspend cash
+            conn.execute("BEGIN IMMEDIATE")
+            if marketable:
+                self._fill(conn, symbol, qty, side, price)
+            conn.execute(
+                "INSERT INTO orders (id, symbol, qty, side, type, status, filled_qty, filled_avg_price) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (order_id, symbol, qty, side, type, "filled" if marketable else "new",
+                 qty if marketable else 0, price if marketable else None),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get_order(order_id)
+
+    def _fill(self, conn, symbol, qty, side, price):
+        cash = conn.execute("SELECT cash FROM account").fetchone()[0]
+        row = conn.execute(
+            "SELECT qty, avg_entry_price FROM positions WHERE symbol = ?", (symbol,)
+        ).fetchone()
+        held, avg_entry_price = row if row else (0, 0.0)
+        if side == "buy":
+            if qty * price > cash:
+                raise Exception("insufficient buying power")
+            avg_entry_price = (held * avg_entry_price + qty * price) / (held + qty)
+            held += qty
+            cash -= qty * price
+        else:
+            if qty > held:
+                raise Exception("insufficient qty available for order")
+            held -= qty
+            cash += qty * price
+
+        conn.execute("UPDATE account SET cash = ?", (cash,))
+        if held:
+            conn.execute(
+                "INSERT OR REPLACE INTO positions (symbol, qty, avg_entry_price) VALUES (?, ?, ?)",
+                (symbol, held, avg_entry_price),
+            )
+        else:
+            conn.execute("DELETE FROM positions WHERE symbol = ?", (symbol,))
+
+    def get_order(self, order_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(ORDER_FIELDS)} FROM orders WHERE id = ?", (order_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(order_id)
+        return self._order_obj(row)
+
+    def cancel_order(self, order_id):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE orders SET status = 'canceled' WHERE id = ? AND status != 'filled'",
+                (order_id,),
+            )
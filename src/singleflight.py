@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from functools import wraps
+
+
+class SingleFlight:
+    """Share one in-flight call between identical concurrent requests.
+
+    Callers are matched by key; while a call for a key is running, any other
+    caller with the same key (from another thread or asyncio task) waits for
+    that call and receives the same result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._metrics = {}
+
+    def _join(self, key, name):
+        """Return (future, is_owner) for key, registering a new call if needed."""
+        with self._lock:
+            stats = self._metrics.setdefault(
+                name, {"calls": 0, "executions": 0, "shared": 0, "errors": 0}
+            )
+            stats["calls"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                stats["shared"] += 1
+                return future, False
+            stats["executions"] += 1
+            future = Future()
+            # A running future cannot be cancelled, so one waiter giving up
+            # (e.g. a cancelled asyncio task) leaves the call for the others
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+            return future, True
+
+    def _run(self, key, name, future, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._metrics[name]["errors"] += 1
+                del self._inflight[key]
+            future.set_exception(e)
+        else:
+            with self._lock:
+                del self._inflight[key]
+            future.set_result(result)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn, or wait for the identical call already in flight."""
+        name = key[0] if isinstance(key, tuple) else str(key)
+        future, owner = self._join(key, name)
+        if owner:
+            self._run(key, name, future, fn, args, kwargs)
+        return future.result()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """Like do(), but runs fn in the default executor so the event loop stays free."""
+        name = key[0] if isinstance(key, tuple) else str(key)
+        future, owner = self._join(key, name)
+        if owner:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self._run, key, name, future, fn, args, kwargs)
+        return await asyncio.wrap_future(future)
+
+    def get_metrics(self):
+        """Per-function call counts, including how many calls were saved."""
+        with self._lock:
+            metrics = {name: dict(stats) for name, stats in self._metrics.items()}
+            in_flight = len(self._inflight)
+        totals = {"calls": 0, "executions": 0, "shared": 0, "errors": 0}
+        for stats in metrics.values():
+            for field in totals:
+                totals[field] += stats[field]
+        return {"functions": metrics, "totals": totals, "in_flight": in_flight}
+
+
+_default_group = SingleFlight()
+
+
+def make_key(func, args, kwargs):
+    """Build a hashable key from a function and its arguments."""
+    name = f"{func.__module__}.{func.__qualname__}"
+    key = (name, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        # Unhashable arguments (e.g. dicts of indicators) are keyed by their repr
+        key = (name, repr(args), repr(sorted(kwargs.items())))
+    return key
+
+
+def single_flight(func=None, group=None):
+    """Decorator that coalesces identical concurrent calls to func.
+
+    The wrapped function keeps its blocking signature; ``func.run_async(...)``
+    awaits the shared call from a coroutine without blocking the event loop.
+    """
+
+    def decorator(func):
+        flight = group or _default_group
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return flight.do(make_key(func, args, kwargs), func, *args, **kwargs)
+
+        async def run_async(*args, **kwargs):
+            return await flight.do_async(make_key(func, args, kwargs), func, *args, **kwargs)
+
+        wrapper.run_async = run_async
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_metrics():
+    """Metrics for the shared single-flight group."""
+    return _default_group.get_metrics()
@@ -0,0 +1,71 @@
+import argparse
+import atexit
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from market_data import compute_technical_indicators, get_stock_data
+from market_snapshot import MarketSnapshot
+from watchlist import get_sp500_tickers
+from config.config import (
+    SNAPSHOT_DAYS,
+    SNAPSHOT_UNIVERSE_SIZE,
+    SNAPSHOT_REFRESH_INTERVAL,
+    SNAPSHOT_WORKERS,
+)
+
+
+def fetch_row(ticker):
+    """Indicators and recent daily bars for one ticker; None for whatever fails."""
+    try:
+        indicators = compute_technical_indicators(ticker)
+    except Exception:
+        indicators = None
+    try:
+        bars = get_stock_data(ticker, period=f"{SNAPSHOT_DAYS}d", interval="1d")
+    except Exception:
+        bars = None
+    return indicators, bars
+
+
+def refresh(snapshot, tickers):
+    """Fetch the universe and publish it; returns how many rows have data."""
+    with ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS) as executor:
+        rows = dict(zip(tickers, executor.map(fetch_row, tickers)))
+    snapshot.write(rows)
+    return sum(1 for indicators, bars in rows.values() if indicators or bars is not None)
+
+
+def run_writer(interval=SNAPSHOT_REFRESH_INTERVAL):
+    """Own the shared snapshot and refresh it every `interval` seconds."""
+    snapshot = MarketSnapshot.create()
+    atexit.register(snapshot.close)
+    while True:
+        started = time.time()
+        try:
+            tickers = get_sp500_tickers()[:SNAPSHOT_UNIVERSE_SIZE]
+            fresh = refresh(snapshot, tickers)
+            print(f"Snapshot: {fresh}/{len(tickers)} symbols refreshed in {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"Snapshot: refresh failed: {str(e)}")
+        time.sleep(max(0, interval - (time.time() - started)))
+
+
+def start_snapshot_writer():
+    """Run the snapshot writer as a child process, stopped when this process exits."""
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__)])
+    atexit.register(process.terminate)
+    return process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the shared market snapshot.")
+    parser.add_argument("--interval", type=float, default=SNAPSHOT_REFRESH_INTERVAL,
+                        help="Seconds between refreshes")
+    args = parser.parse_args()
+
+    # Exit cleanly on terminate so atexit unlinks the shared block
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    run_writer(args.interval)
@@ -0,0 +1,171 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from market_data import get_technical_indicators
+from watchlist import get_momentum_stocks, get_buyer_activity
+from ai_trader import get_trade_decision
+from trade_executor import execute_trade, get_account_info
+from resilience import deadline as dependency_deadline, submit
+from config.config import (
+    RSI_OVERBOUGHT,
+    RSI_OVERSOLD,
+    STRATEGY_INTERVAL_MINUTES,
+    STRATEGY_DRY_RUN,
+    STRATEGY_MAX_WORKERS,
+    STRATEGY_CYCLE_BUDGET,
+    STRATEGY_SCAN_SIZE,
+    STRATEGY_SHORTLIST_SIZE,
+    STRATEGY_MAX_ORDERS_PER_CYCLE,
+)
+
+def indicator_signal(data, held):
+    """Pre-screen a name on indicators: 'buy', 'sell' or None."""
+    rsi, macd_hist = data["rsi"], data["macd_hist"]
+    if not held and (rsi <= RSI_OVERSOLD or (rsi < RSI_OVERBOUGHT and macd_hist > 0)):
+        return "buy"
+    if held and (rsi >= RSI_OVERBOUGHT or macd_hist < 0):
+        return "sell"
+    return None
+
+
+def run_bounded(func, items, max_workers, deadline, failed=None):
+    """Run func over items concurrently, keeping only results finished before the deadline.
+
+    Items whose call raised are recorded in `failed` ({item: message}) when given.
+    """
+    results, timed_out = {}, []
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {submit(executor, func, item): item for item in items}
+    pending = set(futures)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                if failed is not None:
+                    failed[futures[future]] = str(e)
+    for future in pending:
+        future.cancel()
+        timed_out.append(futures[future])
+    executor.shutdown(wait=False)
+    return results, timed_out
+
+
+def run_cycle(dry_run=STRATEGY_DRY_RUN, budget=STRATEGY_CYCLE_BUDGET):
+    """Scan, shortlist on indicators, ask the AI and place orders within limits."""
+    started = time.time()
+    deadline = time.monotonic() + budget
+    report = {
+        "started": started,
+        "dry_run": dry_run,
+        "scanned": 0,
+        "shortlisted": [],
+        "decisions": {},
+        "orders": [],
+        "timed_out": [],
+        "failed": {},
+        "errors": [],
+    }
+
+    # Steps 1-4 share the cycle budget; orders run outside it so one in flight can finish
+    with dependency_deadline(budget):
+        # 1. Universe: watchlist scans plus current holdings (for exits)
+        held = {p.symbol for p in get_account_info()["positions"]}
+        candidates = set(held)
+        for scan in (get_momentum_stocks, get_buyer_activity):
+            stocks = scan(STRATEGY_SCAN_SIZE)
+            if isinstance(stocks, str):  # Error message
+                report["errors"].append(stocks)
+                continue
+            candidates.update(stock["ticker"] for stock in stocks)
+        report["scanned"] = len(candidates)
+
+        # 2. Indicators, with bounded concurrency
+        indicators, timed_out = run_bounded(
+            get_technical_indicators, sorted(candidates), STRATEGY_MAX_WORKERS, deadline,
+            report["failed"],
+        )
+        report["timed_out"].extend(timed_out)
+
+        # 3. Indicator pre-screen; strongest RSI readings first
+        signals = {t: indicator_signal(d, t in held) for t, d in indicators.items()}
+        shortlist = sorted(
+            (t for t, s in signals.items() if s),
+            key=lambda t: abs(indicators[t]["rsi"] - 50),
+            reverse=True,
+        )[:STRATEGY_SHORTLIST_SIZE]
+        report["shortlisted"] = shortlist
+
+        # 4. Decisions for the shortlist only; obvious cases skip the LLM
+        def decide(ticker):
+            return get_trade_decision(ticker, indicators[ticker])
+
+        decisions, timed_out = run_bounded(
+            decide, shortlist, STRATEGY_MAX_WORKERS, deadline, report["failed"]
+        )
+        report["decisions"] = decisions
+        report["timed_out"].extend(timed_out)
+
+    # 5. Orders where a confident decision agrees with the indicator signal
+    for ticker in shortlist:
+        if len(report["orders"]) >= STRATEGY_MAX_ORDERS_PER_CYCLE:
+            break
+        if time.monotonic() >= deadline:
+            report["timed_out"].append(ticker)
+            continue
+        side = signals[ticker]
+        decision = decisions.get(ticker)
+        if decision is None or decision.action != side or not decision.is_actionable():
+            continue
+        # Quantity is sized by execute_trade within MAX_POSITION_SIZE
+        result = "dry run" if dry_run else execute_trade(ticker, side)
+        report["orders"].append({"ticker": ticker, "side": side, "result": result})
+
+    report["duration"] = time.time() - started
+    return report
+
+
+def format_cycle_report(report):
+    """Format a strategy cycle report for Discord."""
+    mode = "DRY RUN" if report["dry_run"] else "LIVE"
+    message = (
+        f"🤖 **Strategy Cycle ({mode})**\n"
+        f"   • Scanned: {report['scanned']} names in {report['duration']:.1f}s\n"
+        f"   • Shortlisted: {', '.join(report['shortlisted']) or 'none'}\n"
+    )
+    for ticker, decision in report["decisions"].items():
+        message += f"   • {ticker}: {decision} ({decision.source})\n"
+    if report["timed_out"]:
+        message += f"   • Out of time budget: {', '.join(report['timed_out'])}\n"
+    if report["failed"]:
+        first = next(iter(report["failed"].values()))
+        message += f"   • Failed: {', '.join(report['failed'])} (first error: {first})\n"
+    for error in report["errors"]:
+        message += f"   • ⚠️ {error}\n"
+
+    if report["orders"]:
+        message += "\n📝 **Orders**\n"
+        for order in report["orders"]:
+            message += f"{order['side'].upper()} {order['ticker']}: {order['result']}\n"
+    else:
+        message += "\nNo orders this cycle.\n"
+    return message
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the automated trading strategy.")
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit")
+    parser.add_argument("--live", action="store_true", help="Place orders instead of a dry run")
+    parser.add_argument("--interval", type=float, default=STRATEGY_INTERVAL_MINUTES,
+                        help="Minutes between cycles")
+    args = parser.parse_args()
+
+    while True:
+        print(format_cycle_report(run_cycle(dry_run=STRATEGY_DRY_RUN and not args.live)))
+        if args.once:
+            break
+        time.sleep(args.interval * 60)
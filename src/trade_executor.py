@@ -1,21 +1,43 @@
-import alpaca_trade_api as tradeapi
-from config.config import APCA_API_KEY_ID, APCA_API_SECRET_KEY, MAX_POSITION_SIZE
+from config.config import APCA_API_KEY_ID, APCA_API_SECRET_KEY, MAX_POSITION_SIZE, BROKER
 import time
+from singleflight import single_flight
+from resilience import guard, ResilienceError
 
-# Initialize Alpaca API
-api = tradeapi.REST(
-    APCA_API_KEY_ID, APCA_API_SECRET_KEY, base_url="https://paper-api.alpaca.markets"
-)
+# Initialize Alpaca API, or the local simulated broker
+if BROKER == "sim":
+    from sim_broker import SimulatedBroker
 
+    api = SimulatedBroker()
+else:
+    import alpaca_trade_api as tradeapi
 
+    # Every call goes through the "alpaca" retry policy and circuit breaker;
+    # order placement is never retried, so an order cannot be sent twice
+    api = guard(
+        tradeapi.REST(
+            APCA_API_KEY_ID, APCA_API_SECRET_KEY, base_url="https://paper-api.alpaca.markets"
+        ),
+        "alpaca",
+        once=("submit_order", "replace_order"),
+    )
+
+
+@single_flight
 def get_current_price(symbol, side="buy"):
-    """Get current price of a stock."""
+    """Get the current bid/ask for an order from the broker's quote.
+
+    Orders are not priced through the market data router: its Yahoo provider
+    has no real bid and ask, only the last trade.
+    """
     try:
         quote = api.get_latest_quote(symbol)
-        # Use ask price for buying, bid price for selling
-        return float(quote.ask_price) if side == "buy" else float(quote.bid_price)
+        bid, ask = float(quote.bid_price), float(quote.ask_price)
     except Exception as e:
         raise Exception(f"Error fetching price for {symbol}: {str(e)}")
+    if bid <= 0 or ask <= 0:
+        raise Exception(f"Error fetching price for {symbol}: no live quote")
+    # Use ask price for buying, bid price for selling
+    return ask if side == "buy" else bid
 
 
 def check_day_trade_count():
@@ -145,6 +167,8 @@ def execute_trade(symbol, side, quantity=None):
 
             # Wait for fill - longer during extended hours
             wait_time = 5 if api.get_clock().is_open else 10
+            if BROKER == "sim":
+                wait_time = 0  # Simulated orders fill on submission
             time.sleep(wait_time)
 
             # Check order status
@@ -251,6 +275,7 @@ def execute_trade(symbol, side, quantity=None):
             )
 
 
+@single_flight
 def get_position(symbol):
     """Get current position information."""
     try:
@@ -262,10 +287,13 @@ def get_position(symbol):
             "market_value": float(position.market_value),
             "unrealized_pl": float(position.unrealized_pl),
         }
+    except ResilienceError:
+        raise  # Alpaca is down; that is not the same as having no position
     except Exception:
         return None
 
 
+@single_flight
 def get_account_info():
     """Get account information."""
     try:
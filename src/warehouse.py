@@ -0,0 +1,204 @@
+import argparse
+import atexit
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.config import (
+    WAREHOUSE_DIR,
+    WAREHOUSE_BACKFILL,
+    WAREHOUSE_WORKERS,
+    WAREHOUSE_UPDATE_MINUTES,
+)
+from data_providers import router
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+FILE_NAME = "bars.parquet"
+
+# interval -> (partition key, strftime format); one file per symbol per partition
+PARTITIONS = {
+    "1d": ("year", "%Y"),
+    "1h": ("month", "%Y-%m"),
+    "1m": ("date", "%Y-%m-%d"),
+}
+
+SYMBOL_PARTITIONING = ds.partitioning(pa.schema([("symbol", pa.string())]), flavor="hive")
+
+
+def normalize_bars(bars):
+    """Bars as a frame with a naive `timestamp` column (exchange wall-clock time)."""
+    df = bars[BAR_COLUMNS].astype("float64")
+    index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    df.index = index.astype("datetime64[ns]")
+    df.index.name = "timestamp"
+    return df.reset_index()
+
+
+class Warehouse:
+    """Local history of bars in Parquet, partitioned by symbol and date.
+
+    Files live at <root>/<interval>/symbol=<SYM>/<key>=<value>/bars.parquet,
+    where the date partition is a year for daily bars and a day for minute
+    bars. Queries pick files by directory name for the requested symbols and
+    date range, push the timestamp filter and column projection down to the
+    Parquet reader, and read through memory-mapped files, so only the data
+    asked for is loaded. A single process should write at a time.
+    """
+
+    def __init__(self, root=WAREHOUSE_DIR):
+        self.root = root
+        self._filesystem = fs.LocalFileSystem(use_mmap=True)
+
+    def _symbol_dir(self, symbol, interval):
+        return os.path.join(self.root, interval, f"symbol={symbol.upper()}")
+
+    def _files(self, symbol, interval, start=None, end=None):
+        """Partition files for a symbol that can overlap [start, end], by directory name."""
+        directory = self._symbol_dir(symbol, interval)
+        if not os.path.isdir(directory):
+            return []
+        _, fmt = PARTITIONS[interval]
+        low = pd.Timestamp(start).strftime(fmt) if start is not None else None
+        high = pd.Timestamp(end).strftime(fmt) if end is not None else None
+        files = []
+        for name in sorted(os.listdir(directory)):
+            value = name.partition("=")[2]
+            if (low and value < low) or (high and value > high):
+                continue
+            path = os.path.join(directory, name, FILE_NAME)
+            if os.path.exists(path):
+                files.append(path)
+        return files
+
+    def write(self, symbol, interval, bars):
+        """Merge bars into a symbol's partitions, newest values winning; returns rows written."""
+        if bars is None or bars.empty:
+            return 0
+        df = normalize_bars(bars)
+        key, fmt = PARTITIONS[interval]
+        for value, part in df.groupby(df["timestamp"].dt.strftime(fmt)):
+            directory = os.path.join(self._symbol_dir(symbol, interval), f"{key}={value}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, FILE_NAME)
+            if os.path.exists(path):
+                part = pd.concat([pq.read_table(path).to_pandas(), part])
+            part = part.drop_duplicates("timestamp", keep="last").sort_values("timestamp")
+            # Write to a temp file and swap it in so readers never see a partial file
+            tmp_path = path + ".tmp"
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp_path)
+            os.replace(tmp_path, path)
+        return len(df)
+
+    def latest(self, symbol, interval="1d"):
+        """Timestamp of the newest stored bar for a symbol, or None."""
+        files = self._files(symbol, interval)
+        if not files:
+            return None
+        timestamps = pq.read_table(files[-1], columns=["timestamp"], memory_map=True)["timestamp"]
+        return pd.Timestamp(timestamps.to_pandas().max()) if len(timestamps) else None
+
+    def query(self, symbols, interval="1d", columns=None, start=None, end=None):
+        """Bars for several symbols in long form: symbol, timestamp and the requested columns."""
+        columns = list(columns or BAR_COLUMNS)
+        files = [path for symbol in symbols for path in self._files(symbol, interval, start, end)]
+        if not files:
+            return pd.DataFrame(columns=["symbol", "timestamp"] + columns)
+
+        dataset = ds.dataset(
+            files,
+            format="parquet",
+            filesystem=self._filesystem,
+            partitioning=SYMBOL_PARTITIONING,
+            partition_base_dir=os.path.join(self.root, interval),
+        )
+        condition = None
+        if start is not None:
+            condition = ds.field("timestamp") >= pd.Timestamp(start).to_pydatetime()
+        if end is not None:
+            upper = ds.field("timestamp") <= pd.Timestamp(end).to_pydatetime()
+            condition = upper if condition is None else condition & upper
+        table = dataset.to_table(columns=["symbol", "timestamp"] + columns, filter=condition)
+        return table.to_pandas()
+
+    def get_bars(self, symbol, interval="1d", start=None, end=None, columns=None):
+        """Bars for one symbol indexed by timestamp, like a provider's get_bars."""
+        df = self.query([symbol], interval, columns, start, end)
+        return df.drop(columns="symbol").set_index("timestamp").sort_index()
+
+    def iter_bars(self, symbols, interval="1d", start=None, end=None, columns=None):
+        """Yield (symbol, bars) one symbol at a time, for runs over large histories."""
+        for symbol in symbols:
+            bars = self.get_bars(symbol, interval, start, end, columns)
+            if not bars.empty:
+                yield symbol, bars
+
+    def get_closes(self, symbols, start=None, end=None):
+        """Daily closes as a DataFrame with one column per symbol."""
+        df = self.query(symbols, "1d", ["Close"], start, end)
+        return df.pivot_table(index="timestamp", columns="symbol", values="Close").sort_index()
+
+    def update(self, symbols, interval="1d"):
+        """Backfill new symbols and append recent bars to the rest.
+
+        A symbol with no history gets WAREHOUSE_BACKFILL[interval]; otherwise
+        bars since its newest stored bar are fetched (overlapping it, so the
+        latest partial bar is corrected). Returns {symbol: rows or error}.
+        """
+
+        def update_symbol(symbol):
+            latest = self.latest(symbol, interval)
+            if latest is None:
+                period = WAREHOUSE_BACKFILL[interval]
+            else:
+                period = f"{(pd.Timestamp.now() - latest).days + 2}d"
+            try:
+                return self.write(symbol, interval, router.get_bars(symbol, period, interval))
+            except Exception as e:
+                return f"error: {str(e)}"
+
+        with ThreadPoolExecutor(max_workers=WAREHOUSE_WORKERS) as executor:
+            return dict(zip(symbols, executor.map(update_symbol, symbols)))
+
+
+warehouse = Warehouse()
+
+
+def start_warehouse_updater(every=WAREHOUSE_UPDATE_MINUTES):
+    """Keep the S&P 500's daily bars updated from a child process, stopped when this process exits."""
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--every", str(every)])
+    atexit.register(process.terminate)
+    return process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill and update the local bar warehouse.")
+    parser.add_argument("--interval", choices=sorted(PARTITIONS), default="1d",
+                        help="Bar interval to maintain")
+    parser.add_argument("--symbols", nargs="*", help="Symbols to update (default: S&P 500)")
+    parser.add_argument("--every", type=float, help="Repeat every N minutes")
+    args = parser.parse_args()
+
+    while True:
+        if args.symbols:
+            symbols = args.symbols
+        else:
+            from watchlist import get_sp500_tickers
+
+            symbols = get_sp500_tickers()
+        started = time.time()
+        results = warehouse.update(symbols, args.interval)
+        errors = {s: r for s, r in results.items() if isinstance(r, str)}
+        print(f"Updated {len(results) - len(errors)}/{len(results)} symbols "
+              f"({args.interval}) in {time.time() - started:.1f}s")
+        for symbol, error in errors.items():
+            print(f"   {symbol}: {error}")
+        if not args.every:
+            break
+        time.sleep(args.every * 60)
@@ -1,20 +1,66 @@
-import yfinance as yf
+import logging
 import pandas as pd
 from datetime import datetime, timedelta
 import numpy as np
+import time
+from singleflight import single_flight
+from market_data import get_daily_bars, get_recorded_tickers
+from message_stream import stream_rows
+from resilience import resilient, ResilienceError
+from config.config import REPLAY_DATA_DIR
 
+logger = logging.getLogger(__name__)
+
+SP500_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+UNIVERSE_TTL = 24 * 60 * 60  # Constituents change rarely; refresh daily
+
+SCAN_SIZE = 50  # Names scanned per request, unless a larger limit is asked for
+
+_universe_cache = {'fetched_at': 0, 'tickers': []}
+
+@resilient('wikipedia')
+def _fetch_sp500_table():
+    return pd.read_html(SP500_URL)[0]
+
+@single_flight
+def get_sp500_tickers():
+    """Get S&P 500 constituent tickers, cached for a day."""
+    if REPLAY_DATA_DIR:
+        return get_recorded_tickers()
+    if time.time() - _universe_cache['fetched_at'] < UNIVERSE_TTL:
+        return _universe_cache['tickers']
+    try:
+        sp500 = _fetch_sp500_table()
+    except Exception:
+        # Keep using the last universe rather than failing if we have one
+        if _universe_cache['tickers']:
+            return _universe_cache['tickers']
+        raise
+    _universe_cache['tickers'] = sp500['Symbol'].tolist()
+    _universe_cache['fetched_at'] = time.time()
+    return _universe_cache['tickers']
+
+def report_skipped(skipped, scanned):
+    """Log the (ticker, error) pairs a scan skipped; raise if it skipped every ticker."""
+    if not skipped:
+        return
+    ticker, error = skipped[0]
+    if len(skipped) == scanned:
+        raise Exception(f"all {scanned} lookups failed (first: {ticker}: {str(error)})")
+    logger.warning("Scan skipped %d/%d tickers: %s (first error: %s)",
+                   len(skipped), scanned, ", ".join(t for t, _ in skipped), error)
+
+@single_flight
 def get_top_gainers(limit=10):
     """Get top gaining stocks from the market."""
     try:
-        # Using yfinance to get S&P 500 tickers
-        sp500 = pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]
-        tickers = sp500['Symbol'].tolist()
+        tickers = get_sp500_tickers()
         
-        gains = []
-        for ticker in tickers[:50]:  # Limiting initial scan to first 50 for performance
+        gains, skipped = [], []
+        batch = tickers[:max(SCAN_SIZE, limit)]
+        for ticker in batch:  # Limiting initial scan for performance
             try:
-                stock = yf.Ticker(ticker)
-                hist = stock.history(period='1d')
+                hist = get_daily_bars(ticker, period='1d')
                 if not hist.empty:
                     current_price = hist['Close'].iloc[-1]
                     prev_price = hist['Open'].iloc[0]
@@ -25,27 +71,31 @@ def get_top_gainers(limit=10):
                         'price': current_price,
                         'volume': hist['Volume'].iloc[-1]
                     })
-            except Exception:
-                continue
+            except ResilienceError:
+                raise  # Upstream down or out of time: stop instead of failing every ticker
+            except Exception as e:
+                skipped.append((ticker, e))
         
+        report_skipped(skipped, len(batch))
+
         # Sort by gain and get top performers
         top_gainers = sorted(gains, key=lambda x: x['gain'], reverse=True)[:limit]
         return top_gainers
     except Exception as e:
         return f"Error fetching top gainers: {str(e)}"
 
+@single_flight
 def get_buyer_activity(limit=10):
     """Get stocks with highest buyer activity based on volume and price action."""
     try:
-        sp500 = pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]
-        tickers = sp500['Symbol'].tolist()
+        tickers = get_sp500_tickers()
         
-        buyer_activity = []
-        for ticker in tickers[:50]:  # Limiting initial scan
+        buyer_activity, skipped = [], []
+        batch = tickers[:max(SCAN_SIZE, limit)]
+        for ticker in batch:  # Limiting initial scan
             try:
-                stock = yf.Ticker(ticker)
                 # Get today's and recent data
-                hist = stock.history(period='5d')
+                hist = get_daily_bars(ticker, period='5d')
                 
                 if len(hist) >= 5:
                     current_price = hist['Close'].iloc[-1]
@@ -76,27 +126,31 @@ def get_buyer_activity(limit=10):
                         'close_strength': close_position * 100,
                         'price_change': ((current_price / hist['Close'].iloc[-2] - 1) * 100)
                     })
-            except Exception:
-                continue
+            except ResilienceError:
+                raise  # Upstream down or out of time: stop instead of failing every ticker
+            except Exception as e:
+                skipped.append((ticker, e))
         
+        report_skipped(skipped, len(batch))
+
         # Sort by buying pressure
         top_buyers = sorted(buyer_activity, key=lambda x: x['buying_pressure'], reverse=True)[:limit]
         return top_buyers
     except Exception as e:
         return f"Error fetching buyer activity: {str(e)}"
 
+@single_flight
 def get_momentum_stocks(limit=10):
     """Get stocks with highest intraday momentum compared to previous close."""
     try:
-        sp500 = pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]
-        tickers = sp500['Symbol'].tolist()
+        tickers = get_sp500_tickers()
         
-        momentum_stocks = []
-        for ticker in tickers[:50]:  # Limiting initial scan
+        momentum_stocks, skipped = [], []
+        batch = tickers[:max(SCAN_SIZE, limit)]
+        for ticker in batch:  # Limiting initial scan
             try:
-                stock = yf.Ticker(ticker)
                 # Get today's and yesterday's data
-                hist = stock.history(period='2d')
+                hist = get_daily_bars(ticker, period='2d')
                 
                 if len(hist) >= 2:
                     current_price = hist['Close'].iloc[-1]
@@ -121,37 +175,81 @@ def get_momentum_stocks(limit=10):
                         'price_change': price_change,
                         'volume_ratio': volume_ratio
                     })
-            except Exception:
-                continue
+            except ResilienceError:
+                raise  # Upstream down or out of time: stop instead of failing every ticker
+            except Exception as e:
+                skipped.append((ticker, e))
         
+        report_skipped(skipped, len(batch))
+
         # Sort by momentum score
         top_momentum = sorted(momentum_stocks, key=lambda x: x['momentum_score'], reverse=True)[:limit]
         return top_momentum
     except Exception as e:
         return f"Error fetching momentum stocks: {str(e)}"
 
+def format_watchlist_row(i, stock, type='gainers'):
+    """Format one ranked stock for the full watchlist message."""
+    if type == 'gainers':
+        return (f"{i}. ${stock['ticker']}\n"
+                f"   • Gain: {stock['gain']:.2f}%\n"
+                f"   • Price: ${stock['price']:.2f}\n"
+                f"   • Volume: {stock['volume']:,.0f}\n\n")
+    elif type == 'buyers':
+        return (f"{i}. ${stock['ticker']}\n"
+                f"   • Buying Pressure: {stock['buying_pressure']:.2f}\n"
+                f"   • Price Change: {stock['price_change']:.2f}%\n"
+                f"   • Volume Surge: {stock['volume_surge']:.1f}x\n"
+                f"   • Close Strength: {stock['close_strength']:.1f}%\n"
+                f"   • Price: ${stock['price']:.2f}\n\n")
+    else:  # momentum
+        return (f"{i}. ${stock['ticker']}\n"
+                f"   • Daily Change: {stock['price_change']:.2f}%\n"
+                f"   • Volume vs Avg: {stock['volume_ratio']:.1f}x\n"
+                f"   • Momentum Score: {stock['momentum_score']:.2f}\n"
+                f"   • Price: ${stock['price']:.2f}\n\n")
+
+# Compact table columns per watchlist type: (header, width, formatter)
+TABLE_COLUMNS = {
+    'gainers': [
+        ('Gain%', 7, lambda s: f"{s['gain']:.2f}"),
+        ('Price', 9, lambda s: f"{s['price']:.2f}"),
+        ('Volume', 12, lambda s: f"{s['volume']:,.0f}"),
+    ],
+    'buyers': [
+        ('Press', 7, lambda s: f"{s['buying_pressure']:.1f}"),
+        ('Chg%', 6, lambda s: f"{s['price_change']:.2f}"),
+        ('Surge', 5, lambda s: f"{s['volume_surge']:.1f}x"),
+        ('Price', 9, lambda s: f"{s['price']:.2f}"),
+    ],
+    'momentum': [
+        ('Chg%', 6, lambda s: f"{s['price_change']:.2f}"),
+        ('Vol', 5, lambda s: f"{s['volume_ratio']:.1f}x"),
+        ('Score', 7, lambda s: f"{s['momentum_score']:.2f}"),
+        ('Price', 9, lambda s: f"{s['price']:.2f}"),
+    ],
+}
+
+def format_watchlist_table_header(type='gainers'):
+    """Header line for the compact table rendering."""
+    columns = TABLE_COLUMNS[type]
+    return f"{'#':>3} {'Ticker':<6}" + "".join(f" {name:>{width}}" for name, width, _ in columns) + "\n"
+
+def format_watchlist_table_row(i, stock, type='gainers'):
+    """Format one ranked stock as a fixed-width table line."""
+    columns = TABLE_COLUMNS[type]
+    return f"{i:>3} {stock['ticker']:<6}" + "".join(f" {fmt(stock):>{width}}" for _, width, fmt in columns) + "\n"
+
+def stream_watchlist_message(stocks, title, type='gainers', compact=False):
+    """Yield the watchlist as Discord-sized chunks, one row at a time."""
+    if compact:
+        rows = (format_watchlist_table_row(i, stock, type) for i, stock in enumerate(stocks, 1))
+        return stream_rows(rows, f"📊 **{title}**\n", format_watchlist_table_header(type), code_block=True)
+    rows = (format_watchlist_row(i, stock, type) for i, stock in enumerate(stocks, 1))
+    return stream_rows(rows, f"📊 **{title}**\n\n")
+
 def format_watchlist_message(stocks, title, type='gainers'):
     """Format the watchlist message for Discord."""
-    message = f"📊 **{title}**\n\n"
-    
-    for i, stock in enumerate(stocks, 1):
-        if type == 'gainers':
-            message += (f"{i}. ${stock['ticker']}\n"
-                       f"   • Gain: {stock['gain']:.2f}%\n"
-                       f"   • Price: ${stock['price']:.2f}\n"
-                       f"   • Volume: {stock['volume']:,.0f}\n\n")
-        elif type == 'buyers':
-            message += (f"{i}. ${stock['ticker']}\n"
-                       f"   • Buying Pressure: {stock['buying_pressure']:.2f}\n"
-                       f"   • Price Change: {stock['price_change']:.2f}%\n"
-                       f"   • Volume Surge: {stock['volume_surge']:.1f}x\n"
-                       f"   • Close Strength: {stock['close_strength']:.1f}%\n"
-                       f"   • Price: ${stock['price']:.2f}\n\n")
-        else:  # momentum
-            message += (f"{i}. ${stock['ticker']}\n"
-                       f"   • Daily Change: {stock['price_change']:.2f}%\n"
-                       f"   • Volume vs Avg: {stock['volume_ratio']:.1f}x\n"
-                       f"   • Momentum Score: {stock['momentum_score']:.2f}\n"
-                       f"   • Price: ${stock['price']:.2f}\n\n")
-    
-    return message 
\ No newline at end of file
+    rows = [f"📊 **{title}**\n\n"]
+    rows.extend(format_watchlist_row(i, stock, type) for i, stock in enumerate(stocks, 1))
+    return "".join(rows)
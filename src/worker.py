@@ -0,0 +1,245 @@
+import argparse
+import atexit
+import os
+import subprocess
+import sys
+import threading
+import time
+from market_data import get_technical_indicators, get_stock_info, get_history
+from ai_trader import get_trade_decision, generate_trade_summary
+from trade_executor import execute_trade
+from watchlist import (
+    get_top_gainers,
+    get_momentum_stocks,
+    get_buyer_activity,
+    stream_watchlist_message,
+    get_sp500_tickers,
+)
+from message_stream import split_message
+from fundamentals import prefetch_fundamentals
+from strategy import run_cycle, format_cycle_report
+from correlation import scanner as correlation_scanner, format_correlated, format_pairs
+from model_router import router as model_router
+from resilience import deadline, get_stats as get_dependency_stats
+from job_queue import get_job_queue, shard_for, MemoryJobQueue
+from config.config import (
+    NUM_WORKERS,
+    WORKER_THREADS,
+    WORKER_POLL_INTERVAL,
+    JOB_PRIORITIES,
+    JOB_DEADLINES,
+)
+
+# scan name -> (scan function, title, format type, error label)
+SCANS = {
+    "gainers": (get_top_gainers, "Today's Top Gainers 📈", "gainers", "top gainers"),
+    "momentum": (get_momentum_stocks, "Today's Top Momentum Stocks 🚀", "momentum", "momentum stocks"),
+    "buyers": (get_buyer_activity, "Stocks with Strong Buying Activity 💪", "buyers", "buyer activity"),
+}
+
+
+def format_value(value, spec=""):
+    """Format a fundamentals value, passing through missing ('N/A') values."""
+    if value is None or value == "N/A":
+        return "N/A"
+    try:
+        return format(value, spec)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def format_year_range(ticker):
+    """52-week low - high from a year of daily bars (read from the warehouse when it is current)."""
+    try:
+        bars = get_history(ticker, "1y", "1d")
+        return f"${bars['Low'].min():,.2f} - ${bars['High'].max():,.2f}"
+    except Exception:
+        return "N/A"
+
+
+def analyze_ticker(ticker):
+    """Build the !trade analysis message for a ticker."""
+    try:
+        technical_data = get_technical_indicators(ticker)
+        stock_info = get_stock_info(ticker)
+        decision = get_trade_decision(ticker, technical_data)
+
+        summary = generate_trade_summary(ticker, decision, technical_data)
+        summary += f"""
+📈 Stock Information:
+   • Name: {stock_info['name']}
+   • Sector: {stock_info['sector']}
+   • Industry: {stock_info['industry']}
+   • Market Cap: ${format_value(stock_info['market_cap'], ',.2f')}
+   • P/E Ratio: {format_value(stock_info['pe_ratio'], '.2f')}
+   • Dividend Yield: {format_value(stock_info['dividend_yield'])}
+   • 52-Week Range: {format_year_range(ticker)}
+"""
+        return summary
+    except Exception as e:
+        return f"❌ Error analyzing {ticker}: {str(e)}"
+
+
+def run_scan(scan, limit=10, compact=False):
+    """Run a watchlist scan and yield it as message chunks."""
+    scan_func, title, scan_type, label = SCANS[scan]
+    try:
+        stocks = scan_func(limit)
+        if isinstance(stocks, str):  # Error message
+            yield f"❌ {stocks}"
+            return
+        yield from stream_watchlist_message(stocks, title, scan_type, compact)
+    except Exception as e:
+        yield f"❌ Error fetching {label}: {str(e)}"
+
+
+def run_correlation(scan, ticker=None, limit=10):
+    """Run the correlated-names or cointegrated-pairs scan."""
+    try:
+        if scan == "pairs":
+            return format_pairs(correlation_scanner.get_pairs(limit))
+        return format_correlated(correlation_scanner.get_correlated(ticker, limit))
+    except Exception as e:
+        return f"❌ Error running {scan} scan: {str(e)}"
+
+
+def place_order(ticker, side, quantity=None):
+    """Place a buy or sell order."""
+    try:
+        return execute_trade(ticker, side, quantity)
+    except Exception as e:
+        return f"❌ Error executing {side} order: {str(e)}"
+
+
+def run_strategy():
+    """Run one strategy cycle and format the report."""
+    try:
+        return format_cycle_report(run_cycle())
+    except Exception as e:
+        return f"❌ Strategy cycle failed: {str(e)}"
+
+
+def format_dependency_stats(stats):
+    """Format circuit breaker and retry counters per external dependency."""
+    message = ""
+    for name, counters in stats.items():
+        state = "🟢" if counters["state"] == "closed" else "🔴" if counters["state"] == "open" else "🟡"
+        message += (
+            f"   • {state} {name}: {counters['calls']} calls, {counters['failures']} failures, "
+            f"{counters['retries']} retries, {counters['rejected']} rejected while open\n"
+        )
+    return message
+
+
+def report_stats(shard):
+    """Format this worker's AI model usage and dependency health."""
+    message = f"🧠 **AI Models (shard {shard})**\n"
+    total_cost = 0.0
+    for name, stats in model_router.get_stats().items():
+        latency = stats["latency"]
+        latency_text = f"{latency * 1000:.0f}ms" if latency is not None else "n/a"
+        message += (
+            f"   • {name}: {stats['calls']} calls, {latency_text} avg, "
+            f"{stats['rate_limited']} rate limited, {stats['fallbacks']} fallbacks, "
+            f"${stats['cost']:.4f}\n"
+        )
+        total_cost += stats["cost"]
+    message += f"   • Total cost: ${total_cost:.4f}\n"
+    dependency_stats = get_dependency_stats()
+    if dependency_stats:
+        message += f"\n🛡️ **Dependencies (shard {shard})**\n" + format_dependency_stats(dependency_stats)
+    return message
+
+
+HANDLERS = {
+    "trade": analyze_ticker,
+    "scan": run_scan,
+    "correlation": run_correlation,
+    "order": place_order,
+    "strategy": run_strategy,
+    "stats": report_stats,
+}
+
+
+def handle_job(queue, job):
+    """Run one job and post its result to the job's channel.
+
+    Handlers return a message or yield message chunks; each chunk is posted
+    as soon as it is ready so the gateway can send it right away. Calls to
+    external services fail fast once the job's JOB_DEADLINES budget is spent.
+    """
+    try:
+        with deadline(JOB_DEADLINES.get(job["kind"])):
+            result = HANDLERS[job["kind"]](**job["payload"])
+            chunks = split_message(result) if isinstance(result, str) else result
+            for chunk in chunks:
+                queue.post_result(job, chunk)
+        queue.finish(job)
+    except Exception as e:
+        queue.post_result(job, f"❌ An error occurred: {str(e)}")
+        queue.finish(job, "failed")
+
+
+def warm_shard(shard, num_shards=NUM_WORKERS):
+    """Prefetch fundamentals for the tickers routed to this shard."""
+    try:
+        tickers = [t for t in get_sp500_tickers() if shard_for(t, num_shards) == shard]
+        result = prefetch_fundamentals(tickers)
+        print(f"Shard {shard}: prefetched fundamentals for {result['fetched']} tickers")
+    except Exception as e:
+        print(f"Shard {shard}: error prefetching fundamentals: {str(e)}")
+
+
+def run_worker(shard, queue=None, threads=WORKER_THREADS, stop_event=None):
+    """Consume jobs for one shard with a few threads until stop_event is set."""
+    queue = queue or get_job_queue()
+    stop_event = stop_event or threading.Event()
+    queue.requeue_running(shard)
+    threading.Thread(target=warm_shard, args=(shard,), daemon=True).start()
+
+    def consume(max_priority):
+        while not stop_event.is_set():
+            job = queue.claim(shard, max_priority)
+            if job is None:
+                stop_event.wait(WORKER_POLL_INTERVAL)
+                continue
+            handle_job(queue, job)
+
+    # The first thread never takes scans, so orders and analyses always have a free lane
+    lanes = [JOB_PRIORITIES["trade"]] + [None] * (threads - 1)
+    consumers = [threading.Thread(target=consume, args=(lane,), daemon=True) for lane in lanes]
+    for consumer in consumers:
+        consumer.start()
+    return consumers
+
+
+def start_workers(queue, num_workers=NUM_WORKERS):
+    """Start one worker per shard: processes for SQLite, threads for the in-memory queue."""
+    if isinstance(queue, MemoryJobQueue):
+        for shard in range(num_workers):
+            run_worker(shard, queue)
+        return []
+
+    script = os.path.abspath(__file__)
+    processes = [
+        subprocess.Popen([sys.executable, script, "--shard", str(shard)])
+        for shard in range(num_workers)
+    ]
+
+    def stop():
+        for process in processes:
+            process.terminate()
+
+    atexit.register(stop)
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a bot worker for one shard.")
+    parser.add_argument("--shard", type=int, required=True, help="Shard number to consume")
+    args = parser.parse_args()
+
+    consumers = run_worker(args.shard)
+    print(f"Worker for shard {args.shard} started with {len(consumers)} threads")
+    while True:
+        time.sleep(60)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules under src/ import each other by bare name and config as a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
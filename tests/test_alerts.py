@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from alerts import AlertEngine
+
+
+def test_above_and_below_trigger_at_their_thresholds():
+    engine = AlertEngine()
+    above = engine.add_alert(1, "aapl", "price", ">", 200)
+    below = engine.add_alert(1, "AAPL", "price", "below", 150)
+    rsi = engine.add_alert(2, "MSFT", "rsi", "<=", 30)
+
+    assert engine.evaluate({"AAPL": {"price": 175}, "MSFT": {"rsi": 45}}) == []
+    matches = engine.evaluate({"AAPL": {"price": 200}, "MSFT": {"rsi": 30}})
+    assert sorted((alert["id"], value) for alert, value in matches) == [(above["id"], 200), (rsi["id"], 30)]
+
+    assert engine.evaluate({"AAPL": {"price": 149.5}}) == [(below, 149.5)]
+    assert engine.get_tickers() == []
+
+
+def test_triggered_alerts_fire_once():
+    engine = AlertEngine()
+    engine.add_alert(1, "AAPL", "price", "above", 100)
+    assert len(engine.evaluate({"AAPL": {"price": 101}})) == 1
+    assert engine.evaluate({"AAPL": {"price": 102}}) == []
+
+
+def test_thresholds_are_matched_per_ticker():
+    engine = AlertEngine()
+    engine.add_alert(1, "AAPL", "price", "above", 100)
+    engine.add_alert(1, "AAPL", "price", "above", 300)
+    engine.add_alert(1, "MSFT", "price", "above", 200)
+    matches = engine.evaluate({"AAPL": {"price": 250}, "MSFT": {"price": 150}})
+    assert [(a["ticker"], a["threshold"]) for a, _ in matches] == [("AAPL", 100)]
+    assert len(engine.get_user_alerts(1)) == 2
+
+
+def test_missing_values_and_unknown_tickers_are_ignored():
+    engine = AlertEngine()
+    engine.add_alert(1, "AAPL", "rsi", "below", 30)
+    assert engine.evaluate({"AAPL": {"price": 10}, "TSLA": {"rsi": 5}}) == []
+    assert engine.evaluate({"AAPL": {"rsi": math.nan}}) == []
+
+
+def test_removed_alerts_do_not_trigger():
+    engine = AlertEngine()
+    alert = engine.add_alert(1, "AAPL", "price", "above", 100)
+    assert not engine.remove_alert(alert["id"], user_id=2)
+    assert engine.remove_alert(alert["id"], user_id=1)
+    assert engine.evaluate({"AAPL": {"price": 500}}) == []
+
+
+def test_invalid_alerts_are_rejected():
+    engine = AlertEngine()
+    with pytest.raises(ValueError):
+        engine.add_alert(1, "AAPL", "eps", "above", 1)
+    with pytest.raises(ValueError):
+        engine.add_alert(1, "AAPL", "price", "crosses", 1)
+
+
+def test_index_stays_correct_after_triggers_and_adds():
+    engine = AlertEngine()
+    low = engine.add_alert(1, "AAPL", "price", "above", 100)
+    high = engine.add_alert(1, "AAPL", "price", "above", 200)
+    other = engine.add_alert(1, "MSFT", "price", "above", 100)
+    assert engine.evaluate({"AAPL": {"price": 150}}) == [(low, 150)]
+    # The pruned index still serves the remaining alerts
+    assert engine.evaluate({"AAPL": {"price": 150}, "MSFT": {"price": 99}}) == []
+    added = engine.add_alert(2, "AAPL", "price", "below", 120)
+    matches = engine.evaluate({"AAPL": {"price": 250}, "MSFT": {"price": 100}})
+    assert sorted(alert["id"] for alert, _ in matches) == [high["id"], other["id"]]
+    assert engine.evaluate({"AAPL": {"price": 110}}) == [(added, 110)]
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import correlation
+from data_providers import period_to_days
+
+TICKERS = list("ABCDEF")
+SESSIONS = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.Timedelta(days=1), periods=400)
+CLOSES = pd.DataFrame(
+    np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, (400, len(TICKERS))), axis=0)) * 100,
+    index=SESSIONS,
+    columns=TICKERS,
+)
+
+
+@pytest.fixture
+def market(monkeypatch):
+    """Serve CLOSES up to a settable number of sessions."""
+    state = {"sessions": len(SESSIONS)}
+
+    def get_daily_closes(tickers, period):
+        closes = CLOSES.iloc[:state["sessions"]][list(tickers)]
+        days = period_to_days(period)
+        return closes.iloc[-days:] if days else closes
+
+    monkeypatch.setattr(correlation, "get_daily_closes", get_daily_closes)
+    monkeypatch.setattr(correlation, "get_sp500_tickers", lambda: TICKERS)
+    return state
+
+
+def refreshed_after(market, tmp_path, gap):
+    scanner = correlation.CorrelationScanner(str(tmp_path / "stale.npz"))
+    market["sessions"] = len(SESSIONS) - gap
+    scanner.refresh()
+    market["sessions"] = len(SESSIONS)
+    scanner.refreshed_on = None
+    scanner.refresh()
+    return scanner
+
+
+@pytest.mark.parametrize("gap", [1, 15, 60])
+def test_incremental_refresh_matches_a_rebuild(market, tmp_path, gap):
+    scanner = refreshed_after(market, tmp_path, gap)
+    rebuilt = correlation.CorrelationScanner(str(tmp_path / "fresh.npz"))
+    rebuilt.refresh()
+    assert scanner.dates[-1] == rebuilt.dates[-1]
+    np.testing.assert_allclose(scanner.correlation(), rebuilt.correlation(), atol=1e-12)
+
+
+def test_new_index_members_trigger_a_rebuild(market, tmp_path, monkeypatch):
+    scanner = correlation.CorrelationScanner(str(tmp_path / "cache.npz"))
+    monkeypatch.setattr(correlation, "get_sp500_tickers", lambda: TICKERS[:4])
+    scanner.refresh()
+    assert scanner.symbols == TICKERS[:4]
+    monkeypatch.setattr(correlation, "get_sp500_tickers", lambda: TICKERS)
+    scanner.refreshed_on = None
+    scanner.refresh()
+    assert scanner.symbols == TICKERS
+    assert correlation.CorrelationScanner(str(tmp_path / "cache.npz")).universe == TICKERS
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+import data_providers
+from data_providers import BAR_COLUMNS, DataRouter, MarketDataProvider, NoDataError, YFinanceProvider
+
+
+def make_bars(close):
+    index = pd.date_range("2024-01-02", periods=3, freq="D")
+    return pd.DataFrame({column: [close] * 3 for column in BAR_COLUMNS}, index=index)
+
+
+class StaticProvider(MarketDataProvider):
+    def __init__(self, name, bars):
+        self.name = name
+        self.bars = bars
+
+    def get_bars(self, ticker, period="1d", interval="1m"):
+        return self.bars
+
+
+class EmptyTicker:
+    def __init__(self, ticker):
+        pass
+
+    def history(self, period, interval):
+        # What yfinance returns for a failed request while hiding exceptions
+        return pd.DataFrame()
+
+
+@pytest.fixture
+def empty_yahoo(monkeypatch):
+    monkeypatch.setattr(data_providers.yf, "Ticker", EmptyTicker)
+    monkeypatch.setattr(
+        data_providers.yf, "download",
+        lambda tickers, **kwargs: pd.DataFrame(
+            float("nan"),
+            index=pd.date_range("2024-01-02", periods=3, freq="D"),
+            columns=pd.MultiIndex.from_product([BAR_COLUMNS, tickers]),
+        ),
+    )
+    return YFinanceProvider()
+
+
+def test_yfinance_raises_on_empty_results(empty_yahoo):
+    with pytest.raises(NoDataError):
+        empty_yahoo.get_bars("AAPL", "5d", "1d")
+    with pytest.raises(NoDataError):
+        empty_yahoo.get_bars_multi(["AAPL", "MSFT"], "5d", "1d")
+
+
+def test_router_fails_over_when_yahoo_returns_nothing(empty_yahoo):
+    backup = StaticProvider("backup", make_bars(101.0))
+    router = DataRouter([empty_yahoo, backup])
+    bars = router.get_bars("AAPL", "5d", "1d")
+    assert bars["Close"].iloc[-1] == 101.0
+    stats = router.get_stats()
+    assert stats["yfinance"]["failures"] == 1 and stats["backup"]["calls"] == 1
+
+
+def test_router_raises_when_every_provider_is_empty(empty_yahoo):
+    router = DataRouter([empty_yahoo])
+    with pytest.raises(Exception, match="All market data providers failed"):
+        router.get_bars("AAPL", "5d", "1d")
@@ -0,0 +1,37 @@
+import pytest
+
+from job_queue import NOT_REQUEUED, MemoryJobQueue, SQLiteJobQueue
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def queue(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    return MemoryJobQueue()
+
+
+def test_results_stay_pending_until_acknowledged(queue):
+    job = {"id": queue.enqueue("chart", {}, channel_id=7), "channel_id": 7}
+    queue.post_result(job, "first")
+    queue.post_result(job, "second")
+
+    pending = queue.pending_results()
+    assert [r["content"] for r in pending] == ["first", "second"]
+    # An unsent result is offered again on the next poll
+    assert [r["content"] for r in queue.pending_results()] == ["first", "second"]
+
+    queue.ack_results([pending[0]["id"]])
+    assert [r["content"] for r in queue.pending_results()] == ["second"]
+
+
+def test_crashed_orders_are_failed_not_requeued(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue("order", {"ticker": "AAPL"}, channel_id=7)
+    queue.enqueue("analysis", {"ticker": "AAPL"}, channel_id=7)
+    assert queue.claim(0)["kind"] == "order"
+    assert queue.claim(0)["kind"] == "analysis"
+
+    queue.requeue_running(0)
+    assert queue.claim(0)["kind"] == "analysis"
+    assert queue.claim(0) is None
+    assert [r["content"] for r in queue.pending_results()] == [NOT_REQUEUED["order"]]
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, DeadlineExceeded, Dependency,
+    check_deadline, deadline, is_rate_limit, is_transient, remaining, submit,
+)
+
+
+def make_dependency(**overrides):
+    options = dict(attempts=3, backoff=(0, 0), failure_threshold=2, reset_timeout=60,
+                   retry_ratio=1, retry_burst=10)
+    options.update(overrides)
+    return Dependency("test", **options)
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.is_open()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.opens == 1 and breaker.rejected == 1
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_one_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=0)
+    for _ in range(5):
+        breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.opens == 2
+
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.release()
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_retried_call_counts_one_breaker_failure():
+    dependency = make_dependency()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        raise TimeoutError("timed out")
+
+    with pytest.raises(TimeoutError):
+        dependency.call(flaky)
+    assert len(attempts) == 3
+    assert dependency.breaker.failures == 1 and dependency.breaker.state == CLOSED
+    with pytest.raises(TimeoutError):
+        dependency.call(flaky)
+    assert dependency.breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        dependency.call(flaky)
+    assert len(attempts) == 6
+
+
+def test_permanent_errors_are_not_retried_or_counted():
+    dependency = make_dependency()
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad ticker")
+
+    with pytest.raises(ValueError):
+        dependency.call(broken)
+    assert len(attempts) == 1 and dependency.breaker.failures == 0
+
+
+def test_classifiers_read_status_codes_not_prose():
+    assert not is_transient(ValueError("No data for S&P 500"))
+    assert is_transient(Exception("HTTP Error 503: Service Unavailable"))
+    assert is_rate_limit(Exception("429 Too Many Requests"))
+
+    class ApiError(Exception):
+        status_code = 404
+
+    # A status attribute wins over the message
+    assert not is_transient(ApiError("rate limit"))
+
+
+def test_deadline_follows_submit_into_threads():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(remaining).result() is None
+        with deadline(5):
+            left = submit(executor, remaining).result()
+            assert 0 < left <= 5
+            # Without submit the worker thread has no deadline
+            assert executor.submit(remaining).result() is None
+        with deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                submit(executor, check_deadline).result()
+
+
+def test_nested_deadlines_keep_the_earliest():
+    with deadline(1):
+        with deadline(10):
+            assert remaining() <= 1
+        with deadline(None):
+            assert remaining() <= 1
+    assert remaining() is None
+
+
+def test_expired_deadline_fails_before_calling():
+    dependency = make_dependency()
+    calls = []
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            dependency.call(calls.append, 1)
+    assert calls == [] and dependency.breaker.state == CLOSED
@@ -0,0 +1,61 @@
+import pytest
+
+from config.config import JOB_PRIORITIES, MAX_QUEUE_DEPTH, PRIORITY_CLASSES
+from job_queue import MemoryJobQueue
+from scheduler import BucketStore, Scheduler, TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(capacity=3, period=60)
+    now = bucket.updated_at
+    for _ in range(3):
+        assert bucket.retry_after(now) == 0
+        bucket.take()
+    assert bucket.retry_after(now) == pytest.approx(20)
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(capacity=2, period=10)
+    now = bucket.updated_at
+    bucket.take()
+    bucket.take()
+    assert bucket.retry_after(now + 2.5) == pytest.approx(2.5)
+    assert bucket.retry_after(now + 5) == 0
+    assert bucket.retry_after(now + 1000) == 0
+    assert bucket.tokens == 2
+
+
+def test_bucket_store_evicts_least_recently_used():
+    store = BucketStore({"scan": (1, 60)}, max_keys=2)
+    first = store.get("scan", 1)
+    store.get("scan", 2)
+    assert store.get("scan", 1) is first
+    store.get("scan", 3)
+    assert len(store) == 2
+    assert store.get("scan", 1) is first
+
+
+def test_scheduler_throttles_per_user_and_class():
+    scheduler = Scheduler(MemoryJobQueue())
+    admitted = 0
+    while scheduler.admit("scan", user_id=1)[0] is not None:
+        admitted += 1
+        assert admitted < 1000
+    priority, reason = scheduler.admit("scan", user_id=1)
+    assert priority is None and "Too many scan requests" in reason
+    # Other users and other classes keep their own allowance
+    assert scheduler.admit("scan", user_id=2)[0] is not None
+    assert scheduler.admit("order", user_id=1)[0] is not None
+
+
+def test_scheduler_sheds_a_full_class_only():
+    queue = MemoryJobQueue()
+    scheduler = Scheduler(queue)
+    priority = JOB_PRIORITIES["scan"]
+    for _ in range(MAX_QUEUE_DEPTH[PRIORITY_CLASSES[priority]]):
+        queue.enqueue("scan", {}, priority=priority)
+    result, reason = scheduler.admit("scan", user_id=1)
+    assert result is None and "busy" in reason
+    assert scheduler.admit("order", user_id=1)[0] == JOB_PRIORITIES["order"]
+    stats = scheduler.get_stats()["classes"]
+    assert stats["scan"]["shed"] == 1 and stats["scan"]["queued"] == MAX_QUEUE_DEPTH["scan"]
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, single_flight
+
+
+def wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out waiting"
+        time.sleep(0.001)
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def fetch(ticker):
+        executions.append(ticker)
+        release.wait(5)
+        return f"{ticker} data"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do(("fetch", "AAPL"), fetch, "AAPL")))
+        for _ in range(5)
+    ]
+    threads[0].start()
+    wait_until(lambda: flight.get_metrics()["in_flight"] == 1)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: flight.get_metrics()["totals"]["calls"] == 5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert executions == ["AAPL"]
+    assert results == ["AAPL data"] * 5
+    metrics = flight.get_metrics()
+    assert metrics["totals"]["executions"] == 1 and metrics["totals"]["shared"] == 4
+    assert metrics["in_flight"] == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do(("fetch", "A"), str.lower, "A") == "a"
+    assert flight.do(("fetch", "B"), str.lower, "B") == "b"
+    assert flight.get_metrics()["totals"]["executions"] == 2
+
+
+def test_exception_reaches_every_waiter_and_clears_the_key():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    assert flight.get_metrics()["in_flight"] == 0
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        return "data"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do_async("key", fetch))
+        second = asyncio.ensure_future(flight.do_async("key", fetch))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "data"
+    metrics = flight.get_metrics()
+    assert metrics["totals"]["executions"] == 1 and metrics["in_flight"] == 0
+
+
+def test_decorator_coalesces_unhashable_arguments():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    @single_flight(group=flight)
+    def summarize(indicators):
+        calls.append(indicators)
+        release.wait(5)
+        return len(indicators)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(summarize({"rsi": 40}))) for _ in range(3)]
+    threads[0].start()
+    wait_until(lambda: flight.get_metrics()["in_flight"] == 1)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: flight.get_metrics()["totals"]["calls"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [1, 1, 1] and len(calls) == 1